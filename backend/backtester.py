@@ -1,7 +1,10 @@
+import numpy as np
 import pandas as pd
-from typing import List, Dict
+from typing import List, Dict, Any
 import logging
 
+import scoring
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -59,4 +62,128 @@ def backtest_strategy(df: pd.DataFrame, holding_days: int = 10, min_score: float
                 'Exit Reason': exit_reason
             })
 
-    return results
\ No newline at end of file
+    return results
+
+# --- Portfolio Backtest ---
+
+PANEL_FIELDS = ('Open', 'High', 'Low', 'Close', 'Volume')
+
+def build_panel(histories: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+    """Aligns per-ticker OHLCV frames (with a Date column) into one date x ticker frame per field."""
+    frames = {}
+    for ticker, df in histories.items():
+        if df is None or df.empty:
+            continue
+        # Bars are keyed by calendar day so tickers with different bar times still line up
+        dates = pd.DatetimeIndex(df['Date'].to_numpy().astype('datetime64[D]'), name='Date')
+        frame = df[list(PANEL_FIELDS)].set_axis(dates)
+        frames[ticker] = frame[~dates.duplicated(keep='last')]
+    if not frames:
+        return {}
+    # One aligned concat for all fields, then split by field
+    wide = pd.concat(frames, axis=1).sort_index()
+    return {field: wide.xs(field, axis=1, level=1) for field in PANEL_FIELDS}
+
+def backtest_portfolio(panel: Dict[str, pd.DataFrame], holding_days: int = 10, min_score: float = 50.0,
+                       stop_loss_pct: float = 5, take_profit_pct: float = 10,
+                       initial_capital: float = 100000.0, max_positions: int = 10) -> Dict[str, Any]:
+    """
+    Runs the score strategy across every symbol of a panel with shared cash.
+    Entries and exits follow backtest_strategy (buy at the close, exit on take profit, stop loss
+    or after holding_days of the symbol's own bars); each day all symbols are processed at once with numpy, and free
+    slots go to the highest-scoring candidates with an equal share of the remaining cash.
+    """
+    close_df = panel['Close']
+    tickers = list(close_df.columns)
+    dates = close_df.index
+    close = close_df.to_numpy(dtype=np.float64)
+    high = panel['High'].to_numpy(dtype=np.float64)
+    low = panel['Low'].to_numpy(dtype=np.float64)
+    mark = close_df.ffill().to_numpy(dtype=np.float64)
+    score = scoring.generate_scores(close_df, panel['Volume'].astype(np.float64)).to_numpy()
+
+    n_days, n_symbols = close.shape
+    shares = np.zeros(n_symbols)
+    entry_price = np.full(n_symbols, np.nan)
+    entry_day = np.zeros(n_symbols, dtype=np.int64)
+    # Bars each position has traded since entry; days the symbol didn't trade don't count
+    bars_held = np.zeros(n_symbols, dtype=np.int64)
+    held = np.zeros(n_symbols, dtype=bool)
+    cash = float(initial_capital)
+    equity = np.empty(n_days)
+    trades: List[Dict] = []
+
+    take_profit = 1 + take_profit_pct / 100
+    stop_loss = 1 - stop_loss_pct / 100
+
+    for t in range(n_days):
+        trading = ~np.isnan(close[t])
+
+        if held.any():
+            open_today = held & trading
+            bars_held[open_today] += 1
+            hit_tp = open_today & (high[t] >= entry_price * take_profit)
+            hit_sl = open_today & ~hit_tp & (low[t] <= entry_price * stop_loss)
+            timed_out = open_today & ~hit_tp & ~hit_sl & (bars_held >= holding_days)
+            exiting = hit_tp | hit_sl | timed_out
+            if exiting.any():
+                exit_price = np.where(hit_tp, entry_price * take_profit, np.where(hit_sl, entry_price * stop_loss, close[t]))
+                cash += float((shares * exit_price)[exiting].sum())
+                for i in np.flatnonzero(exiting):
+                    trades.append({
+                        'Ticker': tickers[i],
+                        'Buy Date': dates[entry_day[i]].strftime('%Y-%m-%d'),
+                        'Sell Date': dates[t].strftime('%Y-%m-%d'),
+                        'Buy Price': round(entry_price[i], 2),
+                        'Sell Price': round(exit_price[i], 2),
+                        'Return (%)': round((exit_price[i] / entry_price[i] - 1) * 100, 2),
+                        'Exit Reason': "Take Profit Hit" if hit_tp[i] else "Stop Loss Hit" if hit_sl[i] else f"Held for {holding_days} days",
+                    })
+                held &= ~exiting
+                shares[exiting] = 0.0
+                entry_price[exiting] = np.nan
+
+        free_slots = max_positions - int(held.sum())
+        if free_slots > 0 and cash > 0:
+            candidates = np.flatnonzero(~held & trading & (score[t] >= min_score))
+            if candidates.size:
+                chosen = candidates[np.argsort(-score[t, candidates], kind='stable')][:free_slots]
+                budget = cash / free_slots
+                shares[chosen] = budget / close[t, chosen]
+                entry_price[chosen] = close[t, chosen]
+                entry_day[chosen] = t
+                bars_held[chosen] = 0
+                held[chosen] = True
+                cash -= budget * chosen.size
+
+        equity[t] = cash + float(np.nansum(shares * mark[t]))
+
+    return _portfolio_report(dates, equity, trades, tickers, initial_capital, held)
+
+def _portfolio_report(dates: pd.DatetimeIndex, equity: np.ndarray, trades: List[Dict], tickers: List[str],
+                      initial_capital: float, held: np.ndarray) -> Dict[str, Any]:
+    returns = pd.DataFrame(trades, columns=['Ticker', 'Return (%)'])
+    per_symbol = {}
+    for ticker, group in returns.groupby('Ticker')['Return (%)']:
+        per_symbol[ticker] = {
+            "total_trades": int(group.size),
+            "win_rate": round(float((group > 0).mean() * 100), 2),
+            "average_return": round(float(group.mean()), 2),
+            "total_return_compounded": round(float(((1 + group / 100).prod() - 1) * 100), 2),
+        }
+
+    peak = np.maximum.accumulate(equity) if equity.size else equity
+    drawdown = (equity / peak - 1) * 100 if equity.size else equity
+    final_equity = float(equity[-1]) if equity.size else initial_capital
+    summary = {
+        "symbols": len(tickers),
+        "total_trades": len(trades),
+        "win_rate": round(float((returns['Return (%)'] > 0).mean() * 100), 2) if trades else 0,
+        "average_return": round(float(returns['Return (%)'].mean()), 2) if trades else 0,
+        "total_return_cumulative": round((final_equity / initial_capital - 1) * 100, 2),
+        "final_equity": round(final_equity, 2),
+        "max_drawdown": round(float(drawdown.min()), 2) if equity.size else 0,
+        "open_positions": [tickers[i] for i in np.flatnonzero(held)],
+    }
+    equity_curve = [{"Date": d.strftime('%Y-%m-%d'), "Equity": round(float(v), 2)} for d, v in zip(dates, equity)]
+    return {"equity_curve": equity_curve, "per_symbol": per_symbol, "trades": trades, "summary": summary}
@@ -0,0 +1,83 @@
+# backend/bench_frames.py
+# Compares the legacy OHLCV frame construction with the compact one used by fetch_data.
+# Usage: python bench_frames.py [bars]
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import fetch_data
+import indicators
+
+INDICATORS = [
+    {"name": "SMA", "params": {"period": 20}},
+    {"name": "EMA", "params": {"period": 20}},
+    {"name": "RSI", "params": {"period": 14}},
+    {"name": "MACD", "params": {"fast": 12, "slow": 26, "signal": 9}},
+    {"name": "BBands", "params": {"period": 20, "std_dev": 2}},
+    {"name": "OBV", "params": {}},
+]
+
+def synthetic_chart(bars: int) -> dict:
+    rng = np.random.default_rng(42)
+    close = 100 + rng.normal(0, 1, bars).cumsum()
+    volume = rng.integers(1_000, 1_000_000, bars).astype(float)
+    close[::97] = np.nan  # upstream sends nulls for halted bars
+    to_list = lambda a: [None if np.isnan(v) else float(v) for v in a]
+    return {
+        "timestamp": list(range(1_200_000_000, 1_200_000_000 + bars * 300, 300)),
+        "indicators": {"quote": [{
+            "open": to_list(close), "high": to_list(close + 1), "low": to_list(close - 1),
+            "close": to_list(close), "volume": to_list(volume),
+        }]},
+    }
+
+def legacy_frame(chart: dict) -> pd.DataFrame:
+    ohlc = chart["indicators"]["quote"][0]
+    df = pd.DataFrame({
+        'Date': [datetime.fromtimestamp(ts) for ts in chart["timestamp"]],
+        'Open': ohlc['open'], 'High': ohlc['high'], 'Low': ohlc['low'],
+        'Close': ohlc['close'], 'Volume': ohlc['volume'],
+    })
+    df.dropna(inplace=True)
+    return df
+
+def legacy_indicators(df: pd.DataFrame) -> pd.DataFrame:
+    df_out = df.copy()
+    for indicator in INDICATORS:
+        df_out = indicators.INDICATOR_FUNCTIONS[indicator["name"]](df_out, indicator["params"])
+    return df_out
+
+def timed(fn, *args, repeat: int = 5):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+def megabytes(df: pd.DataFrame) -> float:
+    return df.memory_usage(index=True, deep=True).sum() / 1e6
+
+def main(bars: int):
+    chart = synthetic_chart(bars)
+    pd.set_option("mode.copy_on_write", True)
+
+    legacy, legacy_build = timed(legacy_frame, chart)
+    compact, compact_build = timed(fetch_data.chart_to_frame, chart)
+    legacy_ind, legacy_calc = timed(legacy_indicators, legacy.set_index('Date'))
+    indicators.INDICATOR_FLOAT32 = False
+    compact_ind, compact_calc = timed(indicators.calculate_indicators, compact.set_index('Date'), INDICATORS)
+    indicators.INDICATOR_FLOAT32 = True
+    compact_f32, f32_calc = timed(indicators.calculate_indicators, compact.set_index('Date'), INDICATORS)
+
+    print(f"bars: {bars}")
+    print(f"{'':28}{'build ms':>10}{'indicators ms':>15}{'frame MB':>10}{'with ind. MB':>14}")
+    print(f"{'legacy':28}{legacy_build * 1e3:10.2f}{legacy_calc * 1e3:15.2f}{megabytes(legacy):10.3f}{megabytes(legacy_ind):14.3f}")
+    print(f"{'compact (float64 ind.)':28}{compact_build * 1e3:10.2f}{compact_calc * 1e3:15.2f}{megabytes(compact):10.3f}{megabytes(compact_ind):14.3f}")
+    print(f"{'compact (float32 ind.)':28}{'':10}{f32_calc * 1e3:15.2f}{'':10}{megabytes(compact_f32):14.3f}")
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
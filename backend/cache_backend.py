@@ -0,0 +1,235 @@
+# backend/cache_backend.py
+import asyncio
+import json
+import socket
+import sqlite3
+import struct
+import threading
+import time
+import logging
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# --- Serialization ---
+# Values shared between workers are stored as bytes. DataFrames use a compact columnar
+# layout: a JSON header describing each column followed by the raw numpy buffers.
+# Anything else (quote dicts, lists) is stored as JSON.
+_MAGIC_FRAME = b"SIQF"
+_MAGIC_JSON = b"SIQJ"
+
+def _encode_array(values: np.ndarray) -> Tuple[Dict[str, Any], bytes]:
+    if values.dtype == object:
+        payload = json.dumps(values.tolist(), default=str).encode()
+        return {"dtype": "json", "nbytes": len(payload)}, payload
+    payload = np.ascontiguousarray(values).tobytes()
+    return {"dtype": values.dtype.str, "nbytes": len(payload)}, payload
+
+def _decode_array(meta: Dict[str, Any], payload: bytes) -> np.ndarray:
+    if meta["dtype"] == "json":
+        return np.array(json.loads(bytes(payload)), dtype=object)
+    # copy() detaches the array from the read-only source buffer
+    return np.frombuffer(payload, dtype=np.dtype(meta["dtype"])).copy()
+
+def serialize(value: Any) -> bytes:
+    if isinstance(value, pd.DataFrame):
+        columns, buffers = [], []
+        for name in value.columns:
+            meta, payload = _encode_array(value[name].to_numpy())
+            meta["name"] = str(name)
+            columns.append(meta)
+            buffers.append(payload)
+        index_meta, index_payload = _encode_array(value.index.to_numpy())
+        index_meta["name"] = value.index.name
+        header = json.dumps({"index": index_meta, "columns": columns}).encode()
+        return b"".join([_MAGIC_FRAME, struct.pack("<I", len(header)), header, index_payload, *buffers])
+    return _MAGIC_JSON + json.dumps(value, default=str).encode()
+
+def deserialize(blob: bytes) -> Any:
+    magic, body = blob[:4], memoryview(blob)[4:]
+    if magic == _MAGIC_JSON:
+        return json.loads(bytes(body))
+    if magic != _MAGIC_FRAME:
+        raise ValueError("Unknown cache payload")
+    (header_len,) = struct.unpack("<I", body[:4])
+    header = json.loads(bytes(body[4:4 + header_len]))
+    offset = 4 + header_len
+
+    def take(meta):
+        nonlocal offset
+        chunk = body[offset:offset + meta["nbytes"]]
+        offset += meta["nbytes"]
+        return _decode_array(meta, chunk)
+
+    index_meta = header["index"]
+    index = pd.Index(take(index_meta), name=index_meta["name"])
+    data = {meta["name"]: take(meta) for meta in header["columns"]}
+    return pd.DataFrame(data, index=index, columns=[meta["name"] for meta in header["columns"]])
+
+# --- Backends ---
+class MemoryCache:
+    """In-process tier. Stores live objects, so hits cost no deserialization."""
+
+    def __init__(self):
+        self.store: Dict[str, Tuple[Any, float]] = {}
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        entry = self.store.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= time.time():
+            self.store.pop(key, None)
+            return None
+        return entry
+
+    def set(self, key: str, value: Any, ttl: float):
+        self.store[key] = (value, time.time() + ttl)
+
+class SQLiteCache:
+    """Shared tier for workers on one host, backed by a WAL-mode SQLite file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL NOT NULL)")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        row = self._connection().execute("SELECT value, expires FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None or row[1] <= time.time():
+            return None
+        return deserialize(row[0]), row[1]
+
+    def set(self, key: str, value: Any, ttl: float):
+        with self._connection() as conn:
+            conn.execute("INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)",
+                         (key, serialize(value), time.time() + ttl))
+            conn.execute("DELETE FROM cache WHERE expires <= ?", (time.time(),))
+
+class RedisCache:
+    """Shared tier speaking the Redis protocol (RESP) directly, so no client library is required."""
+
+    def __init__(self, host: str = "localhost", port: int = 6379, timeout: float = 1.0):
+        self.address = (host, port)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _command(self, *parts: bytes) -> Any:
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.create_connection(self.address, timeout=self.timeout)
+            self._local.sock = sock
+            self._local.reader = sock.makefile("rb")
+        request = b"*%d\r\n" % len(parts) + b"".join(b"$%d\r\n%s\r\n" % (len(p), p) for p in parts)
+        try:
+            sock.sendall(request)
+            return self._read_reply(self._local.reader)
+        except OSError:
+            self._local.sock = None
+            sock.close()
+            raise
+
+    def _read_reply(self, reader) -> Any:
+        line = reader.readline()
+        if not line:
+            raise ConnectionError("Redis connection closed")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest
+        if kind == b"-":
+            raise RuntimeError(rest.decode())
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            if length == -1:
+                return None
+            data = reader.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            return [self._read_reply(reader) for _ in range(int(rest))]
+        raise RuntimeError(f"Unexpected Redis reply: {line!r}")
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        blob = self._command(b"GET", key.encode())
+        if blob is None:
+            return None
+        ttl_ms = self._command(b"PTTL", key.encode())
+        return deserialize(blob), time.time() + max(ttl_ms, 0) / 1000
+
+    def set(self, key: str, value: Any, ttl: float):
+        self._command(b"SET", key.encode(), serialize(value), b"PX", str(int(ttl * 1000)).encode())
+
+class TieredCache:
+    """
+    In-process L1 in front of an optional shared L2. L2 hits are promoted into L1 for their remaining lifetime.
+    L2 calls block on sockets or file locks, so they run in a worker thread; after a failure the
+    shared tier is skipped for `failure_cooldown` seconds rather than stalling every lookup.
+    """
+
+    def __init__(self, shared=None, failure_cooldown: float = 30.0):
+        self.local = MemoryCache()
+        self.shared = shared
+        self.failure_cooldown = failure_cooldown
+        self.shared_retry_at = 0.0
+
+    def _shared_available(self) -> bool:
+        return self.shared is not None and time.monotonic() >= self.shared_retry_at
+
+    def _shared_failed(self, action: str, key: str, e: Exception):
+        self.shared_retry_at = time.monotonic() + self.failure_cooldown
+        logger.warning(f"Shared cache {action} failed for {key}: {e}; bypassing it for {self.failure_cooldown:.0f}s")
+
+    async def get(self, key: str) -> Tuple[Optional[Any], str]:
+        entry = self.local.get(key)
+        if entry is not None:
+            return entry[0], "l1"
+        if not self._shared_available():
+            return None, "miss"
+        try:
+            entry = await asyncio.to_thread(self.shared.get, key)
+        except Exception as e:
+            self._shared_failed("read", key, e)
+            return None, "miss"
+        if entry is None:
+            return None, "miss"
+        value, expires = entry
+        self.local.set(key, value, expires - time.time())
+        return value, "l2"
+
+    async def set(self, key: str, value: Any, ttl: float):
+        self.local.set(key, value, ttl)
+        if self._shared_available():
+            try:
+                await asyncio.to_thread(self.shared.set, key, value, ttl)
+            except Exception as e:
+                self._shared_failed("write", key, e)
+
+def from_url(url: Optional[str]) -> TieredCache:
+    """
+    Builds the cache from a URL:
+    - empty or "memory://" for in-process only,
+    - "sqlite:///path/to/cache.db" for a file shared by workers on one host,
+    - "redis://host:port" for a Redis-protocol server.
+    """
+    if not url or url.startswith("memory://"):
+        return TieredCache()
+    parsed = urlparse(url)
+    if parsed.scheme == "sqlite":
+        return TieredCache(SQLiteCache(parsed.path))
+    if parsed.scheme == "redis":
+        return TieredCache(RedisCache(parsed.hostname or "localhost", parsed.port or 6379))
+    raise ValueError(f"Unsupported cache backend: {url}")
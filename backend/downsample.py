@@ -0,0 +1,55 @@
+# backend/downsample.py
+import numpy as np
+import pandas as pd
+
+def _bucket_starts(n: int, threshold: int) -> np.ndarray:
+    """Start positions of the LTTB buckets: [0], the threshold-2 middle buckets, and [n-1]."""
+    middle = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    return np.concatenate(([0], middle[:-1], [n - 1]))
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: returns the positions of `threshold` points that best
+    preserve the visual shape of (x, y). The first and last points are always kept.
+    Triangle areas are computed for a whole bucket at once; only the walk over buckets is a Python loop.
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    starts = _bucket_starts(n, threshold)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+
+    a = 0
+    for i in range(1, threshold - 1):
+        start, end = starts[i], starts[i + 1]
+        next_start, next_end = end, starts[i + 2] if i + 2 < threshold else n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        selected[i] = a
+    return selected
+
+def downsample_frame(df: pd.DataFrame, max_points: int) -> pd.DataFrame:
+    """
+    Reduces a Date-indexed OHLCV + indicator frame to at most `max_points` rows by LTTB on Close.
+    Each kept row takes the High/Low extremes and total Volume of its bucket,
+    so wicks and volume spikes survive; indicator values are those of the kept bar.
+    """
+    if max_points is None or max_points < 3 or len(df) <= max_points or "Close" not in df.columns:
+        return df
+
+    x = df.index.asi8.astype(np.float64) if isinstance(df.index, pd.DatetimeIndex) else np.arange(len(df), dtype=np.float64)
+    keep = lttb_indices(x, df["Close"].to_numpy(dtype=np.float64), max_points)
+    out = df.iloc[keep].copy()
+
+    starts = _bucket_starts(len(df), max_points)
+    if "High" in df.columns:
+        out["High"] = np.maximum.reduceat(df["High"].to_numpy(), starts)
+    if "Low" in df.columns:
+        out["Low"] = np.minimum.reduceat(df["Low"].to_numpy(), starts)
+    if "Volume" in df.columns:
+        out["Volume"] = np.add.reduceat(df["Volume"].to_numpy(), starts)
+    return out
@@ -1,56 +1,170 @@
+import asyncio
 import requests
+import numpy as np
 import pandas as pd
 import logging
+from dateutil.tz import tzlocal
 from datetime import datetime
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 import os
-import time
+
+import cache_backend
+import metrics
+import upstream
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # --- API Configuration ---
 API_KEY = os.getenv("gPjhcvohSd2iW0jSd0oYZ9KLE8jksnMK14wZIyWD")
-BASE_URL = "https://yfapi.net"
+# Point at a simulated backend (see simulator.py) for load testing
+BASE_URL = os.getenv("MARKET_DATA_BASE_URL", "https://yfapi.net")
 
 # --- Caching Mechanism ---
-CACHE: Dict[str, Any] = {}
+# In-process L1, optionally backed by a tier shared across gunicorn workers (see cache_backend.from_url).
+CACHE = cache_backend.from_url(os.getenv("CACHE_BACKEND_URL"))
 CACHE_EXPIRY_SECONDS = 120
 
-def get_from_cache(key: str) -> Optional[Any]:
-    if key in CACHE:
-        data, timestamp = CACHE[key]
-        if time.time() - timestamp < CACHE_EXPIRY_SECONDS:
-            return data
-    return None
-
-def set_in_cache(key: str, data: Any):
-    CACHE[key] = (data, time.time())
-
-# --- Mappings for YH Finance API ---
-PERIOD_MAPPING = {
-    "1D": {"range": "1d", "interval": "5m"},
-    "1W": {"range": "5d", "interval": "30m"},
-    "1M": {"range": "1mo", "interval": "90m"},
-    "6M": {"range": "6mo", "interval": "1d"},
-    "1Y": {"range": "1y", "interval": "1d"},
-    "5Y": {"range": "5y", "interval": "1wk"},
-    "ALL": {"range": "max", "interval": "1mo"},
+async def get_from_cache(key: str) -> Optional[Any]:
+    data, tier = await CACHE.get(key)
+    metrics.record_cache_lookup(key, tier)
+    return data
+
+async def set_in_cache(key: str, data: Any):
+    await CACHE.set(key, data, CACHE_EXPIRY_SECONDS)
+
+# --- Upstream Calls ---
+def _upstream_get(upstream: str, endpoint: str, params: Dict[str, Any]) -> requests.Response:
+    headers = {'X-API-KEY': API_KEY}
+    try:
+        with metrics.UPSTREAM_LATENCY.time(upstream=upstream):
+            response = requests.get(f"{BASE_URL}{endpoint}", params=params, headers=headers)
+            response.raise_for_status()
+        return response
+    except requests.exceptions.RequestException:
+        metrics.UPSTREAM_ERRORS.inc(upstream=upstream)
+        raise
+
+def _request_quotes(symbols: List[str]) -> List[Dict[str, Any]]:
+    response = _upstream_get("quote", "/v6/finance/quote", {'symbols': ",".join(symbols)})
+    return response.json().get("quoteResponse", {}).get("result", [])
+
+# --- Upstream Scheduling ---
+# One token bucket guards the whole yfapi.net quota; quote lookups from concurrent
+# handlers are merged into multi-symbol calls by the batcher.
+UPSTREAM_LIMITER = upstream.TokenBucket(
+    rate=float(os.getenv("UPSTREAM_RATE_PER_SEC", "5")),
+    capacity=float(os.getenv("UPSTREAM_BURST", "10")),
+)
+BULK_LOAD_MAX_WAIT = float(os.getenv("BULK_LOAD_MAX_WAIT", "120"))
+# Tokens bulk loads leave untouched, so /analyze and /portfolio-data are never shed behind them
+BULK_LOAD_HEADROOM = float(os.getenv("BULK_LOAD_HEADROOM", "5"))
+QUOTE_BATCHER = upstream.QuoteBatcher(
+    _request_quotes,
+    UPSTREAM_LIMITER,
+    window=float(os.getenv("QUOTE_BATCH_WINDOW_MS", "30")) / 1000,
+    max_symbols=int(os.getenv("QUOTE_MAX_SYMBOLS", "10")),
+)
+
+# --- Resampling Layer ---
+# Only one base series per granularity is fetched upstream; every chart period in
+# PERIOD_DERIVATION is derived from it locally by range slicing and OHLCV resampling.
+BASE_SERIES = {
+    "intraday": {"range": "1mo", "interval": "5m"},
+    "daily": {"range": "max", "interval": "1d"},
 }
 
-async def fetch_historical_data(ticker: str, period_key: str) -> pd.DataFrame:
-    cache_key = f"history_{ticker}_{period_key}"
-    cached_data = get_from_cache(cache_key)
+# base: which base series to use; sessions / offset: how much history to keep;
+# resample: pandas rule for the bar size (None keeps the base bars).
+PERIOD_DERIVATION: Dict[str, Dict[str, Any]] = {
+    "1D": {"base": "intraday", "sessions": 1, "resample": None},
+    "1W": {"base": "intraday", "sessions": 5, "resample": "30min"},
+    "1M": {"base": "intraday", "offset": pd.DateOffset(months=1), "resample": "90min"},
+    "6M": {"base": "daily", "offset": pd.DateOffset(months=6), "resample": None},
+    "1Y": {"base": "daily", "offset": pd.DateOffset(years=1), "resample": None},
+    "5Y": {"base": "daily", "offset": pd.DateOffset(years=5), "resample": "W-MON"},
+    "ALL": {"base": "daily", "resample": "MS"},
+}
+
+OHLCV_AGGREGATION = {"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"}
+
+def slice_range(df: pd.DataFrame, sessions: Optional[int] = None, offset: Optional[pd.DateOffset] = None) -> pd.DataFrame:
+    """Keeps the last `sessions` trading days, or everything within `offset` of the last bar."""
+    if df.empty:
+        return df
+    dates = df['Date']
+    if sessions is not None:
+        days = dates.dt.normalize()
+        first_day = days.drop_duplicates().iloc[-sessions:].iloc[0]
+        return df[days >= first_day].reset_index(drop=True)
+    if offset is not None:
+        return df[dates > dates.iloc[-1] - offset].reset_index(drop=True)
+    return df
+
+def resample_ohlcv(df: pd.DataFrame, rule: Optional[str]) -> pd.DataFrame:
+    """
+    Aggregates bars to a coarser size with first/max/min/last/sum.
+    Intraday rules are anchored at each session's first bar, like the upstream's own bars;
+    calendar rules ("W-MON", "MS") are labelled by the start of the period.
+    """
+    if df.empty or rule is None:
+        return df
+    freq = pd.tseries.frequencies.to_offset(rule)
+    if isinstance(freq, pd.offsets.Tick):
+        dates = df['Date']
+        session_open = dates.groupby(dates.dt.normalize()).transform("min")
+        buckets = session_open + ((dates - session_open) // freq.delta) * freq.delta
+        out = df.groupby(buckets.rename('Date')).agg(OHLCV_AGGREGATION).reset_index()
+    else:
+        out = df.resample(freq, on='Date', closed='left', label='left').agg(OHLCV_AGGREGATION).reset_index()
+    # Calendar bins with no trades come back empty and are dropped
+    return out.dropna(subset=['Close']).reset_index(drop=True)
+
+def _local_timezone():
+    # Dates are local naive times, as datetime.fromtimestamp produced before. A named zone keeps the
+    # conversion vectorized; dateutil's tzlocal() is only a fallback because pandas converts it per element.
+    tz_name = os.getenv("TZ")
+    if not tz_name and os.path.islink("/etc/localtime"):
+        tz_name = os.path.realpath("/etc/localtime").partition("zoneinfo/")[2]
+    if tz_name:
+        try:
+            pd.Timestamp(0, tz=tz_name.lstrip(":"))
+            return tz_name.lstrip(":")
+        except Exception:
+            pass
+    return tzlocal()
+
+LOCAL_TIMEZONE = _local_timezone()
+
+def chart_to_frame(chart_data: Dict[str, Any]) -> pd.DataFrame:
+    """
+    Builds a compact OHLCV frame: local naive datetime64 dates, float64 prices, int64 volumes.
+    Timestamps are converted in one vectorized call and bars with any missing field are dropped.
+    """
+    timestamps = np.asarray(chart_data["timestamp"], dtype=np.int64)
+    ohlc = chart_data["indicators"]["quote"][0]
+
+    dates = pd.to_datetime(timestamps, unit='s', utc=True).tz_convert(LOCAL_TIMEZONE).tz_localize(None)
+    columns = {name: np.asarray(ohlc[name.lower()], dtype=np.float64) for name in ('Open', 'High', 'Low', 'Close', 'Volume')}
+    valid = np.logical_and.reduce([~np.isnan(values) for values in columns.values()])
+
+    df = pd.DataFrame({'Date': dates[valid], **{name: values[valid] for name, values in columns.items()}})
+    df['Volume'] = df['Volume'].astype(np.int64)
+    return df
+
+async def fetch_base_series(ticker: str, granularity: str, max_wait: float = 2.0, reserve: float = 0.0,
+                            raise_on_shed: bool = False) -> pd.DataFrame:
+    cache_key = f"history_{ticker}_base_{granularity}"
+    cached_data = await get_from_cache(cache_key)
     if isinstance(cached_data, pd.DataFrame):
         return cached_data
 
-    params = PERIOD_MAPPING.get(period_key, PERIOD_MAPPING["1M"])
+    params = BASE_SERIES[granularity]
     endpoint = f"/v8/finance/chart/{ticker}"
-    headers = {'X-API-KEY': API_KEY}
     
     try:
-        response = requests.get(f"{BASE_URL}{endpoint}", params=params, headers=headers)
-        response.raise_for_status()
+        response = await upstream.call_with_retries(_upstream_get, "chart", endpoint, params, limiter=UPSTREAM_LIMITER,
+                                                   max_wait=max_wait, reserve=reserve)
         data = response.json()
 
         chart_data = data.get("chart", {}).get("result", [])[0]
@@ -58,22 +172,15 @@ async def fetch_historical_data(ticker: str, period_key: str) -> pd.DataFrame:
             logger.warning(f"No historical data in response for {ticker}")
             return pd.DataFrame()
 
-        timestamps = chart_data["timestamp"]
-        ohlc = chart_data["indicators"]["quote"][0]
-        
-        df = pd.DataFrame({
-            'Date': [datetime.fromtimestamp(ts) for ts in timestamps],
-            'Open': ohlc['open'],
-            'High': ohlc['high'],
-            'Low': ohlc['low'],
-            'Close': ohlc['close'],
-            'Volume': ohlc['volume']
-        })
-        
-        df.dropna(inplace=True)
-        set_in_cache(cache_key, df)
+        df = chart_to_frame(chart_data)
+        await set_in_cache(cache_key, df)
         return df
 
+    except upstream.QuotaExhaustedError as e:
+        if raise_on_shed:
+            raise
+        logger.warning(f"Shedding historical data request for {ticker}: {e}")
+        return pd.DataFrame()
     except requests.exceptions.RequestException as e:
         logger.error(f"YH API request failed for {ticker} historical data: {e}")
         return pd.DataFrame()
@@ -81,22 +188,67 @@ async def fetch_historical_data(ticker: str, period_key: str) -> pd.DataFrame:
         logger.error(f"Error parsing historical data for {ticker}: {e}")
         return pd.DataFrame()
 
+async def fetch_historical_data(ticker: str, period_key: str) -> pd.DataFrame:
+    cache_key = f"history_{ticker}_{period_key}"
+    cached_data = await get_from_cache(cache_key)
+    if isinstance(cached_data, pd.DataFrame):
+        return cached_data
+
+    derivation = PERIOD_DERIVATION.get(period_key, PERIOD_DERIVATION["1M"])
+    base = await fetch_base_series(ticker, derivation["base"])
+    if base.empty:
+        return base
+
+    df = slice_range(base, sessions=derivation.get("sessions"), offset=derivation.get("offset"))
+    df = resample_ohlcv(df, derivation.get("resample"))
+    await set_in_cache(cache_key, df)
+    return df
+
+async def fetch_many_histories(tickers: List[str], years: int) -> Dict[str, pd.DataFrame]:
+    """
+    Loads daily histories for many tickers concurrently. Requests still pass through the
+    shared rate limiter; bulk loads queue for a slot instead of being shed, but only use
+    tokens above BULK_LOAD_HEADROOM so interactive requests keep priority.
+    """
+    frames = await asyncio.gather(*(fetch_base_series(t, "daily", max_wait=BULK_LOAD_MAX_WAIT, reserve=BULK_LOAD_HEADROOM)
+                                    for t in dict.fromkeys(tickers)))
+    offset = pd.DateOffset(years=years)
+    return {t: slice_range(df, offset=offset) for t, df in zip(dict.fromkeys(tickers), frames) if not df.empty}
+
+async def fetch_daily_histories(tickers: List[str], years: int, max_wait: float = 2.0) -> Tuple[Dict[str, pd.DataFrame], List[str]]:
+    """
+    Interactive counterpart of fetch_many_histories: calls keep normal priority but are shed
+    after `max_wait`. Returns the loaded histories and the tickers that were shed.
+    """
+    unique = list(dict.fromkeys(tickers))
+    frames = await asyncio.gather(*(fetch_base_series(t, "daily", max_wait=max_wait, raise_on_shed=True) for t in unique),
+                                  return_exceptions=True)
+    shed = [t for t, df in zip(unique, frames) if isinstance(df, upstream.QuotaExhaustedError)]
+    for df in frames:
+        if isinstance(df, BaseException) and not isinstance(df, upstream.QuotaExhaustedError):
+            raise df
+    offset = pd.DateOffset(years=years)
+    histories = {t: slice_range(df, offset=offset) for t, df in zip(unique, frames) if isinstance(df, pd.DataFrame) and not df.empty}
+    return histories, shed
+
+async def fetch_latest_closes(tickers: List[str]) -> Dict[str, Tuple[float, pd.Timestamp]]:
+    """Latest price per ticker with the local calendar day it was traded, from the (batched) quote API."""
+    infos = await asyncio.gather(*(fetch_stock_info(t) for t in dict.fromkeys(tickers)))
+    latest = {}
+    for ticker, info in zip(dict.fromkeys(tickers), infos):
+        if info and info.get("currentPrice") and info.get("marketTime"):
+            traded = pd.Timestamp(info["marketTime"], unit='s', tz='UTC').tz_convert(LOCAL_TIMEZONE).tz_localize(None).normalize()
+            latest[ticker] = (float(info["currentPrice"]), traded)
+    return latest
+
 async def fetch_stock_info(ticker: str) -> Optional[Dict[str, Any]]:
     cache_key = f"info_{ticker}"
-    cached_data = get_from_cache(cache_key)
+    cached_data = await get_from_cache(cache_key)
     if cached_data is not None:
         return cached_data
 
-    endpoint = f"/v6/finance/quote"
-    headers = {'X-API-KEY': API_KEY}
-    params = {'symbols': ticker}
-
     try:
-        response = requests.get(f"{BASE_URL}{endpoint}", params=params, headers=headers)
-        response.raise_for_status()
-        data = response.json()
-        
-        info = data.get("quoteResponse", {}).get("result", [])[0]
+        info = await QUOTE_BATCHER.get_quote(ticker)
         if not info:
             logger.warning(f"No profile info found for {ticker}")
             return None
@@ -105,11 +257,12 @@ async def fetch_stock_info(ticker: str) -> Optional[Dict[str, Any]]:
             "symbol": info.get("symbol"),
             "currentPrice": info.get("regularMarketPrice"),
             "previousClose": info.get("regularMarketPreviousClose"),
+            "marketTime": info.get("regularMarketTime"),
             "marketCap": info.get("marketCap"),
             "trailingPE": info.get("trailingPE"),
             "launchDate": str(datetime.fromtimestamp(info.get("firstTradeDateMilliseconds", 0)//1000).date()) if info.get("firstTradeDateMilliseconds") else "N/A"
         }
-        set_in_cache(cache_key, required_info)
+        await set_in_cache(cache_key, required_info)
         return required_info
     except Exception as e:
         logger.error(f"Error fetching stock info for {ticker}: {e}")
@@ -120,21 +273,15 @@ async def fetch_batch_stock_info(tickers: List[str]) -> Dict[str, Any]:
     
     ticker_string = ",".join(tickers)
     cache_key = f"batch_{ticker_string}"
-    cached_data = get_from_cache(cache_key)
+    cached_data = await get_from_cache(cache_key)
     if cached_data is not None:
         return cached_data
 
-    endpoint = f"/v6/finance/quote"
-    headers = {'X-API-KEY': API_KEY}
-    params = {'symbols': ticker_string}
-
     try:
-        response = requests.get(f"{BASE_URL}{endpoint}", params=params, headers=headers)
-        response.raise_for_status()
-        data = response.json()
+        quotes = await QUOTE_BATCHER.get_quotes(tickers)
         
         results = {}
-        result_list = data.get("quoteResponse", {}).get("result", [])
+        result_list = [item for item in quotes.values() if item]
         if result_list:
             for item in result_list:
                 ticker_symbol = item.get("symbol")
@@ -152,11 +299,12 @@ async def fetch_batch_stock_info(tickers: List[str]) -> Dict[str, Any]:
             elif key == "^BSESN": final_results["SENSEX"] = value
             else: final_results[key] = value
         
-        set_in_cache(cache_key, final_results)
+        await set_in_cache(cache_key, final_results)
         return final_results
     except Exception as e:
         logger.error(f"Batch fetch failed for tickers {tickers}: {e}")
         return {t: {"currentPrice": 0, "change": 0, "percentChange": 0} for t in tickers}
 
 async def fetch_data_for_range(ticker: str, start_date: str, end_date: str) -> pd.DataFrame:
-    return await fetch_historical_data(ticker, "5Y") # Fallback to 5Y of daily data for export
\ No newline at end of file
+    # Fallback to 5Y of daily data for export, taken straight from the daily base series
+    return slice_range(await fetch_base_series(ticker, "daily"), offset=pd.DateOffset(years=5))
\ No newline at end of file
@@ -0,0 +1,173 @@
+# backend/formula.py
+"""
+A small expression language for user-defined indicators, e.g.
+
+    ema(close, 9) - sma(close, 21)
+    zscore(volume, 20)
+    close / sma(close, 50) > 1.05
+
+Expressions are parsed with `ast` and checked against a whitelist; nothing is ever
+passed to eval(). Each expression compiles once into a FormulaPlan, a flat list of
+vectorized steps with shared sub-expressions computed only once.
+"""
+import ast
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+MAX_EXPRESSION_LENGTH = 500
+MAX_STEPS = 64
+MAX_WINDOW = 5000
+
+SERIES = {"open": "Open", "high": "High", "low": "Low", "close": "Close", "volume": "Volume"}
+
+def _rsi(x: pd.Series, n: int) -> pd.Series:
+    delta = x.diff()
+    gain = delta.clip(lower=0).ewm(alpha=1/n, adjust=False).mean()
+    loss = -delta.clip(upper=0).ewm(alpha=1/n, adjust=False).mean()
+    return (100 - 100 / (1 + gain / loss)).replace([np.inf, -np.inf], np.nan)
+
+def _zscore(x: pd.Series, n: int) -> pd.Series:
+    rolling = x.rolling(window=n)
+    return (x - rolling.mean()) / rolling.std()
+
+# name -> (function, number of integer window arguments, default windows)
+PRIMITIVES: Dict[str, Tuple[Callable[..., pd.Series], int, Tuple[int, ...]]] = {
+    "sma": (lambda x, n: x.rolling(window=n).mean(), 1, ()),
+    "ema": (lambda x, n: x.ewm(span=n, adjust=False).mean(), 1, ()),
+    "std": (lambda x, n: x.rolling(window=n).std(), 1, ()),
+    "sum": (lambda x, n: x.rolling(window=n).sum(), 1, ()),
+    "highest": (lambda x, n: x.rolling(window=n).max(), 1, ()),
+    "lowest": (lambda x, n: x.rolling(window=n).min(), 1, ()),
+    "zscore": (_zscore, 1, ()),
+    "rsi": (_rsi, 1, (14,)),
+    "diff": (lambda x, n: x.diff(n), 1, (1,)),
+    "shift": (lambda x, n: x.shift(n), 1, (1,)),
+    "abs": (lambda x: x.abs(), 0, ()),
+    "log": (lambda x: np.log(x.where(x > 0)), 0, ()),
+}
+
+_BINARY_OPS = {ast.Add: "+", ast.Sub: "-", ast.Mult: "*", ast.Div: "/"}
+_COMPARE_OPS = {ast.Gt: ">", ast.GtE: ">=", ast.Lt: "<", ast.LtE: "<="}
+
+class FormulaError(ValueError):
+    pass
+
+class FormulaPlan:
+    """
+    Steps are tuples whose first item is the operation and whose remaining items are
+    constants or indices of earlier steps. The last step is the result.
+    """
+
+    def __init__(self, expression: str, steps: List[Tuple[Any, ...]]):
+        self.expression = expression
+        self.steps = steps
+
+    def evaluate(self, df: pd.DataFrame) -> pd.Series:
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            return self._evaluate(df)
+
+    def _evaluate(self, df: pd.DataFrame) -> pd.Series:
+        values: List[Any] = []
+        for step in self.steps:
+            op = step[0]
+            if op == "col":
+                values.append(df[step[1]].astype(np.float64))
+            elif op == "const":
+                # numpy scalars give inf/nan instead of raising on e.g. 1/0
+                values.append(np.float64(step[1]))
+            elif op == "call":
+                fn = PRIMITIVES[step[1]][0]
+                values.append(fn(values[step[2]], *step[3]))
+            elif op == "neg":
+                values.append(-values[step[1]])
+            elif op == "bin":
+                a, b = values[step[2]], values[step[3]]
+                if step[1] == "+": values.append(a + b)
+                elif step[1] == "-": values.append(a - b)
+                elif step[1] == "*": values.append(a * b)
+                else: values.append(a / b)
+            elif op == "cmp":
+                a, b = values[step[2]], values[step[3]]
+                if step[1] == ">": result = a > b
+                elif step[1] == ">=": result = a >= b
+                elif step[1] == "<": result = a < b
+                else: result = a <= b
+                values.append(result.astype(np.float64))
+        result = values[-1]
+        if not isinstance(result, pd.Series):
+            result = pd.Series(float(result), index=df.index)
+        return result.replace([np.inf, -np.inf], np.nan)
+
+class _Compiler:
+    def __init__(self):
+        self.steps: List[Tuple[Any, ...]] = []
+        self.seen: Dict[Tuple[Any, ...], int] = {}
+
+    def emit(self, step: Tuple[Any, ...]) -> int:
+        # Identical sub-expressions map to the same step, so they are computed once
+        if step not in self.seen:
+            if len(self.steps) >= MAX_STEPS:
+                raise FormulaError("Formula is too complex")
+            self.seen[step] = len(self.steps)
+            self.steps.append(step)
+        return self.seen[step]
+
+    def visit(self, node: ast.AST) -> int:
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+            try:
+                value = float(node.value)
+            except OverflowError:
+                raise FormulaError("Number is too large") from None
+            return self.emit(("const", value))
+        if isinstance(node, ast.Name):
+            if node.id not in SERIES:
+                raise FormulaError(f"Unknown series '{node.id}', expected one of {', '.join(SERIES)}")
+            return self.emit(("col", SERIES[node.id]))
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+            operand = self.visit(node.operand)
+            return operand if isinstance(node.op, ast.UAdd) else self.emit(("neg", operand))
+        if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPS:
+            return self.emit(("bin", _BINARY_OPS[type(node.op)], self.visit(node.left), self.visit(node.right)))
+        if isinstance(node, ast.Compare) and len(node.ops) == 1 and type(node.ops[0]) in _COMPARE_OPS:
+            return self.emit(("cmp", _COMPARE_OPS[type(node.ops[0])], self.visit(node.left), self.visit(node.comparators[0])))
+        if isinstance(node, ast.Call):
+            return self.visit_call(node)
+        raise FormulaError(f"Unsupported syntax: {ast.unparse(node)}")
+
+    def visit_call(self, node: ast.Call) -> int:
+        if not isinstance(node.func, ast.Name) or node.func.id not in PRIMITIVES:
+            raise FormulaError(f"Unknown function, expected one of {', '.join(PRIMITIVES)}")
+        if node.keywords or not node.args:
+            raise FormulaError(f"{node.func.id}() takes a series followed by integer windows")
+        name = node.func.id
+        _, arity, defaults = PRIMITIVES[name]
+        windows = []
+        for arg in node.args[1:]:
+            if not (isinstance(arg, ast.Constant) and isinstance(arg.value, int) and not isinstance(arg.value, bool)):
+                raise FormulaError(f"Windows passed to {name}() must be integer literals")
+            if not 1 <= arg.value <= MAX_WINDOW:
+                raise FormulaError(f"Window for {name}() must be between 1 and {MAX_WINDOW}")
+            windows.append(arg.value)
+        if len(windows) < arity and defaults:
+            windows.extend(defaults[len(windows):])
+        if len(windows) != arity:
+            raise FormulaError(f"{name}() expects {arity} window argument(s)")
+        return self.emit(("call", name, self.visit(node.args[0]), tuple(windows)))
+
+@lru_cache(maxsize=256)
+def compile_formula(expression: str) -> FormulaPlan:
+    """Parses and validates an expression. Plans are cached by expression text."""
+    if len(expression) > MAX_EXPRESSION_LENGTH:
+        raise FormulaError("Formula is too long")
+    try:
+        tree = ast.parse(expression.strip(), mode="eval")
+    except SyntaxError as e:
+        raise FormulaError(f"Invalid formula: {e.msg}") from None
+    compiler = _Compiler()
+    compiler.visit(tree.body)
+    if not any(step[0] == "col" for step in compiler.steps):
+        raise FormulaError(f"Formula must use at least one of {', '.join(SERIES)}")
+    return FormulaPlan(expression, compiler.steps)
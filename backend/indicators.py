@@ -1,6 +1,12 @@
 import pandas as pd
 import numpy as np
-from typing import List, Dict, Any, Callable
+import json
+import os
+from collections import OrderedDict
+from typing import List, Dict, Any, Callable, Optional, Tuple
+
+import formula
+import metrics
 
 # --- Individual Indicator Calculation Functions ---
 
@@ -147,7 +153,23 @@ def calculate_tsi(df: pd.DataFrame, params: Dict) -> pd.DataFrame:
     df['TSI'] = 100 * (ema2 / abs_ema2)
     return df
 
-# --- Main Dynamic Calculation Function ---
+# Labels a custom formula may not take, since its column would be dropped in favour of the price data
+RESERVED_COLUMNS = {"Date", "Open", "High", "Low", "Close", "Volume"}
+
+def validate_custom(params: Dict) -> Tuple[formula.FormulaPlan, str]:
+    """Compiles a custom formula and resolves its column label; raises FormulaError on bad input."""
+    expression = str(params.get('expr', ''))
+    label = str(params.get('label') or f'Custom({expression})')
+    if label in RESERVED_COLUMNS:
+        raise formula.FormulaError(f"Label '{label}' is reserved, choose another name")
+    return formula.compile_formula(expression), label
+
+def calculate_custom(df: pd.DataFrame, params: Dict) -> pd.DataFrame:
+    plan, label = validate_custom(params)
+    df[label] = plan.evaluate(df)
+    return df
+
+# --- Indicator Registry ---
 
 INDICATOR_FUNCTIONS: Dict[str, Callable[[pd.DataFrame, Dict], pd.DataFrame]] = {
     "SMA": calculate_sma,
@@ -163,25 +185,108 @@ INDICATOR_FUNCTIONS: Dict[str, Callable[[pd.DataFrame, Dict], pd.DataFrame]] = {
     "StochRSI": calculate_stoch_rsi,
     "Klinger": calculate_klinger,
     "LinReg": calculate_lin_reg_curve,
-    "TSI": calculate_tsi
+    "TSI": calculate_tsi,
+    "Custom": calculate_custom
 }
 
-def calculate_indicators(df: pd.DataFrame, indicators_to_calc: List[Dict[str, Any]]) -> pd.DataFrame:
+# --- Result Cache ---
+
+class IndicatorCache:
+    """
+    LRU cache of indicator output columns, bounded by their memory footprint.
+    Entries are stored per single indicator, so a request that adds one indicator
+    to a previously seen set only computes the new columns.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries: "OrderedDict[Tuple, Tuple[Dict[str, pd.Series], int]]" = OrderedDict()
+
+    def get(self, key: Tuple) -> Optional[Dict[str, pd.Series]]:
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        self.entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key: Tuple, columns: Dict[str, pd.Series]):
+        nbytes = sum(int(series.memory_usage(index=False, deep=True)) for series in columns.values())
+        if nbytes > self.max_bytes:
+            return
+        if key in self.entries:
+            self.size -= self.entries.pop(key)[1]
+        self.entries[key] = (columns, nbytes)
+        self.size += nbytes
+        while self.size > self.max_bytes:
+            _, (_, evicted_bytes) = self.entries.popitem(last=False)
+            self.size -= evicted_bytes
+
+INDICATOR_CACHE = IndicatorCache(max_bytes=int(os.getenv("INDICATOR_CACHE_MB", "64")) * 1024 * 1024)
+
+# Indicators are computed in float64 and, when enabled, stored as float32 to halve their footprint.
+INDICATOR_FLOAT32 = os.getenv("INDICATOR_FLOAT32", "0") == "1"
+
+SERIES_KEY_COLUMNS = ("Open", "High", "Low", "Close", "Volume")
+
+def canonical_spec(name: str, params: Dict[str, Any]) -> str:
+    return json.dumps({"name": name, "params": params}, sort_keys=True, default=str)
+
+def _compute_columns(df: pd.DataFrame, name: str, params: Dict) -> Optional[Dict[str, pd.Series]]:
+    """Runs one indicator on a shallow copy and returns only the columns it added."""
+    work = df.copy(deep=False)
+    try:
+        work = INDICATOR_FUNCTIONS[name](work, params)
+    except Exception as e:
+        print(f"Error calculating indicator '{name}': {e}")
+        return None
+    columns = {col: work[col] for col in work.columns if col not in df.columns}
+    if INDICATOR_FLOAT32:
+        columns = {col: series.astype(np.float32) for col, series in columns.items()}
+    return columns
+
+# --- Main Dynamic Calculation Function ---
+
+def calculate_indicators(df: pd.DataFrame, indicators_to_calc: List[Dict[str, Any]], cache_key: Optional[Tuple[str, str]] = None) -> pd.DataFrame:
+    """
+    `cache_key` is (ticker, period). When given, each indicator's output is memoized
+    against that key and the shape of the series, including the last bar's values,
+    so repeated requests skip the computation.
+    """
     if df.empty or "Close" not in df.columns:
         return df
 
-    df_out = df.copy()
+    new_columns: Dict[str, pd.Series] = {}
+    series_key = None
+    if cache_key is not None:
+        # The last bar (today's daily bar, the open intraday bucket, the current week or month)
+        # keeps its timestamp while it updates, so its values are part of the key
+        last_bar = tuple(df[col].iloc[-1].item() for col in SERIES_KEY_COLUMNS if col in df.columns)
+        series_key = (cache_key[0].upper(), cache_key[1], df.index[0], df.index[-1], len(df), last_bar)
 
     for indicator in indicators_to_calc:
         name = indicator.get("name")
         params = indicator.get("params", {})
         
-        calculation_function = INDICATOR_FUNCTIONS.get(str(name))
-        
-        if name and calculation_function:
-            try:
-                df_out = calculation_function(df_out, params)
-            except Exception as e:
-                print(f"Error calculating indicator '{name}': {e}")
+        if not name or str(name) not in INDICATOR_FUNCTIONS:
+            continue
+
+        columns = None
+        if series_key is not None:
+            key = series_key + (canonical_spec(str(name), params),)
+            columns = INDICATOR_CACHE.get(key)
+            metrics.CACHE_REQUESTS.inc(kind="indicator", tier="l1" if columns is not None else "miss",
+                                       result="hit" if columns is not None else "miss")
+        if columns is None:
+            columns = _compute_columns(df, str(name), params)
+            if columns is None:
+                continue
+            if series_key is not None:
+                INDICATOR_CACHE.put(key, columns)
+
+        new_columns.update(columns)  # a later indicator with the same column name wins
     
-    return df_out
\ No newline at end of file
+    if not new_columns:
+        return df.copy(deep=False)
+    # One concat instead of repeated column inserts; the input frame itself is never copied or modified
+    return pd.concat([df, pd.DataFrame(new_columns, index=df.index)], axis=1)
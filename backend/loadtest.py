@@ -0,0 +1,147 @@
+# backend/loadtest.py
+"""
+Closed-loop load generator for the StockIQ API.
+
+Each worker thread picks an endpoint from a weighted mix, sends a realistic request,
+and records its latency. At the end it prints throughput and p50/p95/p99 per endpoint.
+Run it against an API pointed at simulator.py so yfapi.net is never touched:
+
+    python loadtest.py --base-url http://localhost:8000 --concurrency 32 --duration 60
+    python loadtest.py --mix analyze=60,market-indices=40,backtest=10
+"""
+import argparse
+import csv
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Tuple
+
+import requests
+
+# /backtest is left out by default: main calls backtester.run, which doesn't exist yet, so it only
+# returns instant 500s that would skew throughput and latency. Add it with --mix once it works.
+DEFAULT_MIX = "analyze=45,portfolio-data=22,market-indices=22,login=11"
+PERIODS = ["1D", "1W", "1M", "6M", "1Y", "5Y", "ALL"]
+INDICATOR_SETS = [
+    [{"name": "EMA", "params": {"period": 50}}],
+    [{"name": "SMA", "params": {"period": 50}}, {"name": "EMA", "params": {"period": 20}},
+     {"name": "RSI", "params": {"period": 14}}, {"name": "MACD", "params": {"fast": 12, "slow": 26, "signal": 9}}],
+    [{"name": "BBands", "params": {"period": 20, "std_dev": 2}}, {"name": "OBV", "params": {}}],
+]
+
+def load_universe(limit: int = 200) -> List[str]:
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "nse_tickers.csv")
+    with open(path, newline="") as f:
+        symbols = [row["SYMBOL"] for row in csv.DictReader(f)]
+    random.Random(0).shuffle(symbols)
+    return [f"{s}.NS" for s in symbols[:limit]]
+
+# --- Scenarios ---
+# Each returns (method, path, json body or None)
+
+def make_scenarios(universe: List[str], username: str, password: str) -> Dict[str, Callable[[], Tuple[str, str, dict]]]:
+    # A small hot set gets most traffic, like a real watchlist-driven workload
+    hot = universe[:20]
+    pick = lambda: random.choice(hot) if random.random() < 0.8 else random.choice(universe)
+    return {
+        "analyze": lambda: ("POST", "/analyze", {
+            "ticker": pick(), "period": random.choice(PERIODS),
+            "indicators": random.choice(INDICATOR_SETS), "max_points": 1000,
+        }),
+        "portfolio-data": lambda: ("POST", "/portfolio-data", {"tickers": random.sample(hot, random.randint(3, 10))}),
+        "market-indices": lambda: ("GET", "/market-indices", None),
+        "backtest": lambda: ("POST", "/backtest", {
+            "ticker": pick(), "holding_days": 10, "min_score": 60, "stop_loss_pct": 5, "take_profit_pct": 10,
+        }),
+        "login": lambda: ("POST", "/login", {"username": username, "password": password}),
+    }
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    def record(self, endpoint: str, seconds: float, ok: bool):
+        with self.lock:
+            self.latencies[endpoint].append(seconds)
+            if not ok:
+                self.errors[endpoint] += 1
+
+    def report(self, elapsed: float) -> str:
+        lines = [f"{'endpoint':<16}{'requests':>10}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"]
+        total = 0
+        for endpoint in sorted(self.latencies):
+            values = sorted(self.latencies[endpoint])
+            total += len(values)
+            lines.append(
+                f"{endpoint:<16}{len(values):>10}{self.errors[endpoint]:>8}{len(values) / elapsed:>9.1f}"
+                f"{percentile(values, 50) * 1e3:>9.1f}{percentile(values, 95) * 1e3:>9.1f}{percentile(values, 99) * 1e3:>9.1f}"
+            )
+        lines.append(f"{'total':<16}{total:>10}{sum(self.errors.values()):>8}{total / elapsed:>9.1f}")
+        return "\n".join(lines)
+
+def worker(base_url: str, scenarios, mix: Dict[str, float], deadline: float, recorder: Recorder, timeout: float):
+    session = requests.Session()
+    names, weights = list(mix), list(mix.values())
+    while time.monotonic() < deadline:
+        endpoint = random.choices(names, weights)[0]
+        method, path, body = scenarios[endpoint]()
+        start = time.perf_counter()
+        try:
+            response = session.request(method, base_url + path, json=body, timeout=timeout)
+            ok = response.status_code < 400
+        except requests.exceptions.RequestException:
+            ok = False
+        recorder.record(endpoint, time.perf_counter() - start, ok)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=30, help="seconds")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="endpoint=weight pairs")
+    parser.add_argument("--universe", type=int, default=200, help="number of NSE tickers to draw from")
+    parser.add_argument("--username", default="loadtest")
+    parser.add_argument("--password", default="loadtest-password")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    scenarios = make_scenarios(load_universe(args.universe), args.username, args.password)
+    mix = parse_mix(args.mix)
+    unknown = set(mix) - set(scenarios)
+    if unknown:
+        parser.error(f"unknown endpoints in mix: {', '.join(sorted(unknown))}")
+
+    if "login" in mix:
+        # Registers the load-test user in the target's users.json; a 400 means it already exists
+        requests.post(f"{args.base_url}/signup", json={"username": args.username, "password": args.password}, timeout=args.timeout)
+
+    recorder = Recorder()
+    start = time.monotonic()
+    deadline = start + args.duration
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for _ in range(args.concurrency):
+            pool.submit(worker, args.base_url, scenarios, mix, deadline, recorder, args.timeout)
+    print(recorder.report(time.monotonic() - start))
+
+if __name__ == "__main__":
+    main()
@@ -3,13 +3,15 @@ import os
 import numpy as np
 from datetime import datetime
 import pandas as pd
-from fastapi import FastAPI, Query, HTTPException, status
+import asyncio
+import time
+from fastapi import FastAPI, Query, HTTPException, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Set
 import json
 from passlib.context import CryptContext
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, PlainTextResponse
 import io
 import feedparser
 
@@ -19,10 +21,15 @@ import indicators
 import fetch_data
 import news_helper
 import backtester
+import risk
+import downsample
+import metrics
 
 # --- App Setup ---
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
+# Copy-on-write lets cached frames be shared between requests without defensive copies
+pd.set_option("mode.copy_on_write", True)
 app = FastAPI(title="StockIQ API v20 (Stable)", version="20.0.0")
 
 @app.get("/")
@@ -43,6 +50,56 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# --- Instrumentation ---
+_known_paths: Optional[Set[str]] = None
+
+def endpoint_label(path: str) -> str:
+    """Route path for metric labels; anything unrouted is "other" so scanners can't inflate label cardinality."""
+    global _known_paths
+    if _known_paths is None:
+        # Every route is registered by the time the first request arrives
+        _known_paths = {route.path for route in app.routes}
+    return path if path in _known_paths else "other"
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    endpoint = endpoint_label(request.url.path)
+    profiler = None
+    if endpoint not in ("/metrics", "/debug/profile"):
+        profiler = metrics.take_profiler()
+        if profiler:
+            profiler.start()
+    start = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        metrics.REQUEST_LATENCY.observe(time.perf_counter() - start, method=request.method, endpoint=endpoint, status=status_code)
+        if profiler:
+            metrics.store_profile(endpoint, profiler.stop())
+
+@app.on_event("startup")
+async def start_event_loop_monitor():
+    app.state.loop_lag_task = asyncio.create_task(metrics.monitor_event_loop_lag())
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+@app.post("/debug/profile")
+async def arm_profiler():
+    metrics.arm_profiler()
+    return {"status": "armed", "detail": "The next request will be profiled."}
+
+@app.get("/debug/profile", response_class=PlainTextResponse)
+async def get_profile():
+    report = metrics.get_last_profile()
+    if report is None:
+        raise HTTPException(status_code=404, detail="No profile captured yet.")
+    return PlainTextResponse(report)
+
 # --- Models ---
 class NewsItem(BaseModel): title: str; date: str; summary: str; link: str
 class IndicatorSetting(BaseModel): name: str; params: Dict[str, Any]
@@ -50,6 +107,7 @@ class AnalysisRequest(BaseModel):
     ticker: str
     period: str
     indicators: List[IndicatorSetting]
+    max_points: Optional[int] = Field(None, ge=3, description="Downsample the chart to at most this many bars (LTTB).")
 class AnalysisResponse(BaseModel):
     ticker: str
     data: List[Dict[str, Any]]
@@ -66,12 +124,27 @@ class PredictionResponse(BaseModel):
     sentiment: float
 class ExchangeRateResponse(BaseModel): usd_to_inr: float
 class PortfolioRequest(BaseModel): tickers: List[str]
+class PortfolioRiskRequest(BaseModel):
+    holdings: Dict[str, float]  # ticker -> quantity
+    benchmark: str = "^NSEI"
+    window: int = Field(60, ge=20, le=750)
+    confidence: float = Field(0.95, gt=0.5, lt=1.0)
 class UserCreate(BaseModel): username: str; password: str
 class UserLogin(BaseModel): username: str; password: str
 class Transaction(BaseModel): type: str; ticker: str; quantity: float; price: float; timestamp: str
 class TransactionRequest(BaseModel): username: str; transaction: Transaction
 class BacktestRequest(BaseModel): ticker: str; holding_days: int; min_score: float; stop_loss_pct: float; take_profit_pct: float
 class BacktestResponse(BaseModel): results: List[Dict]; summary: Dict[str, Any]
+class PortfolioBacktestRequest(BaseModel):
+    tickers: List[str]
+    holding_days: int
+    min_score: float
+    stop_loss_pct: float
+    take_profit_pct: float
+    initial_capital: float = 100000.0
+    max_positions: int = Field(10, ge=1)
+    years: int = Field(10, ge=1, le=30)
+class PortfolioBacktestResponse(BaseModel): equity_curve: List[Dict]; per_symbol: Dict[str, Dict]; trades: List[Dict]; summary: Dict[str, Any]
 
 # --- DB Helpers ---
 def get_db(filename: str) -> Dict:
@@ -153,6 +226,60 @@ async def get_transactions(username: str):
 async def get_portfolio_data(req: PortfolioRequest):
     return await fetch_data.fetch_batch_stock_info(req.tickers)
 
+# Background rebuilds of risk panels, one per holdings set
+RISK_PANEL_BUILDS: Dict[Any, asyncio.Task] = {}
+
+async def _build_risk_panel(key, tickers: List[str], years: int):
+    """Bulk-loads the histories at background priority and caches the aligned close panel."""
+    try:
+        histories = await fetch_data.fetch_many_histories(tickers, years=years)
+        if histories:
+            risk.cache_panel(key, backtester.build_panel(histories)['Close'])
+    except Exception as e:
+        logger.error(f"Risk panel build failed for {len(tickers)} tickers: {e}")
+    finally:
+        RISK_PANEL_BUILDS.pop(key, None)
+
+def _schedule_risk_panel(key, tickers: List[str], years: int):
+    if key not in RISK_PANEL_BUILDS:
+        RISK_PANEL_BUILDS[key] = asyncio.create_task(_build_risk_panel(key, tickers, years))
+
+@app.post("/portfolio-risk")
+async def get_portfolio_risk(req: PortfolioRiskRequest):
+    holdings = {t: q for t, q in req.holdings.items() if q}
+    if not holdings:
+        raise HTTPException(status_code=400, detail="At least one holding is required.")
+    tickers = sorted(holdings) + [req.benchmark]
+    # At least two years of daily bars, and always more than the window
+    years = max(2, req.window // 250 + 1)
+    key = risk.panel_key(tickers, years)
+
+    close, fresh = risk.get_cached_panel(key)
+    if close is None:
+        histories, shed = await fetch_data.fetch_daily_histories(tickers, years=years)
+        if shed:
+            # Too many cold symbols for the interactive quota: finish loading them in the background
+            _schedule_risk_panel(key, tickers, years)
+            retry_after = int(len(shed) / fetch_data.UPSTREAM_LIMITER.rate) + 1
+            raise HTTPException(status_code=503, detail=f"Loading history for {len(shed)} holdings, retry in about {retry_after}s.",
+                                headers={"Retry-After": str(retry_after)})
+        if req.benchmark not in histories:
+            raise HTTPException(status_code=404, detail=f"No data for benchmark {req.benchmark}.")
+        close = backtester.build_panel(histories)['Close']
+        risk.cache_panel(key, close)
+    elif not fresh:
+        _schedule_risk_panel(key, tickers, years)
+
+    if req.benchmark not in close.columns:
+        raise HTTPException(status_code=404, detail=f"No data for benchmark {req.benchmark}.")
+    close = risk.with_latest_prices(close, await fetch_data.fetch_latest_closes(list(close.columns)))
+    try:
+        report = risk.portfolio_risk(close, holdings, req.benchmark, req.window, req.confidence)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    report["missing"] = [t for t in holdings if t not in close.columns]
+    return report
+
 @app.get("/market-indices")
 async def get_market_indices():
     return await fetch_data.fetch_batch_stock_info(["^NSEI", "^BSESN"])
@@ -168,8 +295,15 @@ async def get_general_news():
 # --- Core ---
 @app.post("/analyze", response_model=AnalysisResponse)
 async def analyze_stock(req: AnalysisRequest):
+    for ind in req.indicators:
+        if ind.name == "Custom":
+            try:
+                indicators.validate_custom(ind.params)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=f"Invalid custom indicator: {e}")
     try:
-        df_chart = await fetch_data.fetch_historical_data(req.ticker, req.period)
+        with metrics.span("analyze", "fetch_historical_data"):
+            df_chart = await fetch_data.fetch_historical_data(req.ticker, req.period)
         if df_chart.empty:
             return AnalysisResponse(
                 ticker=req.ticker,
@@ -182,18 +316,27 @@ async def analyze_stock(req: AnalysisRequest):
                 launchDate=None
             )
 
-        stock_info = await fetch_data.fetch_stock_info(req.ticker) or {}
+        with metrics.span("analyze", "fetch_stock_info"):
+            stock_info = await fetch_data.fetch_stock_info(req.ticker) or {}
         indicators_as_dicts = [ind.dict() for ind in req.indicators]
-        df_with_indicators = indicators.calculate_indicators(df_chart.set_index('Date'), indicators_as_dicts)
+        with metrics.span("analyze", "calculate_indicators"):
+            df_with_indicators = indicators.calculate_indicators(df_chart.set_index('Date'), indicators_as_dicts, cache_key=(req.ticker, req.period))
 
-        news_dict_list = get_fallback_news()
+        with metrics.span("analyze", "get_fallback_news"):
+            news_dict_list = get_fallback_news()
         current_price = stock_info.get("currentPrice") or df_with_indicators['Close'].iloc[-1]
 
-        chart_data_list = df_with_indicators.reset_index().replace({pd.NA: None, np.nan: None}).to_dict(orient="records")
-        final_chart_data = [
-            {str(k): (v.isoformat() if isinstance(v, (datetime, pd.Timestamp)) else v) for k, v in row.items()}
-            for row in chart_data_list
-        ]
+        # Downsample only after the indicators so their values come from the full series
+        if req.max_points:
+            with metrics.span("analyze", "downsample"):
+                df_with_indicators = downsample.downsample_frame(df_with_indicators, req.max_points)
+
+        with metrics.span("analyze", "serialize"):
+            chart_data_list = df_with_indicators.reset_index().replace({pd.NA: None, np.nan: None}).to_dict(orient="records")
+            final_chart_data = [
+                {str(k): (v.isoformat() if isinstance(v, (datetime, pd.Timestamp)) else v) for k, v in row.items()}
+                for row in chart_data_list
+            ]
 
         return AnalysisResponse(
             ticker=stock_info.get("symbol", req.ticker.upper()),
@@ -232,6 +375,29 @@ async def run_backtest(req: BacktestRequest):
         logger.error(f"Backtest error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/backtest-portfolio", response_model=PortfolioBacktestResponse)
+async def run_portfolio_backtest(req: PortfolioBacktestRequest):
+    if not req.tickers:
+        raise HTTPException(status_code=400, detail="At least one ticker is required.")
+    try:
+        with metrics.span("backtest_portfolio", "load_histories"):
+            histories = await fetch_data.fetch_many_histories(req.tickers, req.years)
+        with metrics.span("backtest_portfolio", "build_panel"):
+            panel = backtester.build_panel(histories)
+        if not panel:
+            raise HTTPException(status_code=404, detail="No historical data for the requested tickers.")
+        with metrics.span("backtest_portfolio", "simulate"):
+            report = await asyncio.to_thread(
+                backtester.backtest_portfolio, panel, req.holding_days, req.min_score,
+                req.stop_loss_pct, req.take_profit_pct, req.initial_capital, req.max_positions
+            )
+        return PortfolioBacktestResponse(**report)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Portfolio backtest error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/export")
 async def export_stock_data(ticker: str, startDate: str, endDate: str):
     df = await fetch_data.fetch_data_for_range(ticker, startDate, endDate)
@@ -0,0 +1,223 @@
+# backend/metrics.py
+import asyncio
+import sys
+import threading
+import time
+import logging
+from collections import Counter as _StackCounter
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# --- Metric Primitives ---
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_lock = threading.Lock()
+REGISTRY: List["_Metric"] = []
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{str(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.label_names)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        super().__init__(name, help_text, label_names)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with _lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with _lock:
+            for key, value in self.values.items():
+                lines.append(f"{self.name}{_format_labels(self.label_names, key)} {value}")
+        return lines
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with _lock:
+            self.values[self._key(labels)] = value
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [bucket counts..., sum, count]
+        self.values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with _lock:
+            state = self.values.get(key)
+            if state is None:
+                state = self.values[key] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with _lock:
+            for key, state in self.values.items():
+                for bound, count in zip(self.buckets, state):
+                    le = 'le="%s"' % bound
+                    lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {count}")
+                le = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {state[-1]}")
+                lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {state[-2]}")
+                lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {state[-1]}")
+        return lines
+
+def render_prometheus() -> str:
+    lines: List[str] = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+# --- Application Metrics ---
+REQUEST_LATENCY = Histogram("stockiq_request_seconds", "Latency of HTTP requests per endpoint.", ("method", "endpoint", "status"))
+STAGE_LATENCY = Histogram("stockiq_stage_seconds", "Latency of individual stages inside an endpoint.", ("endpoint", "stage"))
+UPSTREAM_LATENCY = Histogram("stockiq_upstream_seconds", "Latency of upstream market-data calls.", ("upstream",))
+UPSTREAM_ERRORS = Counter("stockiq_upstream_errors_total", "Failed upstream market-data calls.", ("upstream",))
+UPSTREAM_RETRIES = Counter("stockiq_upstream_retries_total", "Upstream calls retried after a transient failure.")
+UPSTREAM_SHED = Counter("stockiq_upstream_shed_total", "Upstream calls rejected because the rate-limit quota was exhausted.")
+QUOTE_BATCH_SIZE = Histogram("stockiq_quote_batch_symbols", "Symbols merged into one upstream quote call.",
+                             buckets=(1, 2, 5, 10, 20, 50))
+CACHE_REQUESTS = Counter("stockiq_cache_requests_total", "fetch_data cache lookups by outcome and serving tier.", ("kind", "tier", "result"))
+EVENT_LOOP_LAG = Histogram("stockiq_event_loop_lag_seconds", "Delay between a scheduled wake-up and the event loop running it.",
+                           buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0))
+EVENT_LOOP_LAG_LAST = Gauge("stockiq_event_loop_lag_last_seconds", "Most recent event-loop lag sample.")
+
+@contextmanager
+def span(endpoint: str, stage: str):
+    """Times one stage of an endpoint, e.g. `with span("analyze", "fetch_history"):`."""
+    with STAGE_LATENCY.time(endpoint=endpoint, stage=stage):
+        yield
+
+def record_cache_lookup(key: str, tier: str):
+    """`tier` is "l1", "l2" or "miss", as reported by the tiered cache."""
+    kind = key.split("_", 1)[0]
+    CACHE_REQUESTS.inc(kind=kind, tier=tier, result="miss" if tier == "miss" else "hit")
+
+async def monitor_event_loop_lag(interval: float = 0.5):
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - start - interval)
+        EVENT_LOOP_LAG.observe(lag)
+        EVENT_LOOP_LAG_LAST.set(lag)
+
+# --- Sampling Profiler ---
+class SamplingProfiler:
+    """
+    Samples the event-loop thread at a fixed interval from a background thread, together with
+    the asyncio.to_thread workers where upstream calls and cache I/O run. Idle workers are skipped.
+    Stacks are rooted at "event-loop" or "worker"; worker samples may include other requests
+    that were in flight at the same time.
+    Output is in collapsed-stack format ("frame;frame;frame count"), ready for flamegraph tools.
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.005, include_workers: bool = True):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.include_workers = include_workers
+        self.samples: _StackCounter = _StackCounter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _sampled_threads(self) -> Dict[int, str]:
+        threads = {self.thread_id: "event-loop"}
+        if self.include_workers:
+            # The loop's default executor names its threads "asyncio_N"
+            for thread in threading.enumerate():
+                if thread.name.startswith("asyncio_") and thread.ident is not None:
+                    threads[thread.ident] = "worker"
+        return threads
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            threads = self._sampled_threads()
+            for thread_id, frame in sys._current_frames().items():
+                root = threads.get(thread_id)
+                if root is None:
+                    continue
+                if root == "worker" and frame.f_code.co_name == "_worker":
+                    continue  # waiting for work in the executor queue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stack.append(root)
+                self.samples[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="stockiq-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> str:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return "\n".join(f"{stack} {count}" for stack, count in self.samples.most_common())
+
+_profile_armed = False
+_last_profile: Optional[str] = None
+
+def arm_profiler():
+    """Profiles the next request handled by the app."""
+    global _profile_armed
+    _profile_armed = True
+
+def take_profiler() -> Optional[SamplingProfiler]:
+    global _profile_armed
+    if not _profile_armed:
+        return None
+    _profile_armed = False
+    return SamplingProfiler(threading.get_ident())
+
+def store_profile(endpoint: str, report: str):
+    global _last_profile
+    _last_profile = f"# endpoint: {endpoint}\n{report}\n"
+    logger.info(f"Captured sampling profile for {endpoint}")
+
+def get_last_profile() -> Optional[str]:
+    return _last_profile
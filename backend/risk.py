@@ -0,0 +1,205 @@
+# backend/risk.py
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+TRADING_DAYS = 252
+# Running sums drift slightly with every add/remove; rebuild them from the window this often
+FULL_REBUILD_EVERY = 250
+
+class RollingCovariance:
+    """
+    Covariance of the last `window` rows of a return matrix, kept as running sums
+    (sum of returns and sum of outer products) so that one new daily bar costs O(N^2)
+    instead of recomputing the whole O(window * N^2) product.
+    """
+
+    def __init__(self, columns: List[str], returns: np.ndarray, last_date: pd.Timestamp):
+        self.columns = columns
+        self.window = returns.shape[0]
+        self._rebuild(returns)
+        self.last_date = last_date
+
+    def _rebuild(self, returns: np.ndarray):
+        self.returns = returns.copy()
+        self.head = 0  # position of the oldest row in the ring buffer
+        self.sum = returns.sum(axis=0)
+        self.sum_outer = returns.T @ returns
+        self.updates = 0
+
+    def push(self, row: np.ndarray, date: pd.Timestamp):
+        oldest = self.returns[self.head]
+        self.sum += row - oldest
+        self.sum_outer += np.outer(row, row) - np.outer(oldest, oldest)
+        self.returns[self.head] = row
+        self.head = (self.head + 1) % self.window
+        self.last_date = date
+        self.updates += 1
+        if self.updates >= FULL_REBUILD_EVERY:
+            self._rebuild(self.ordered_returns())
+
+    def replace_latest(self, row: np.ndarray):
+        """Today's bar keeps changing until the close; swap the newest row in place."""
+        newest = (self.head - 1) % self.window
+        latest = self.returns[newest]
+        self.sum += row - latest
+        self.sum_outer += np.outer(row, row) - np.outer(latest, latest)
+        self.returns[newest] = row
+
+    def ordered_returns(self) -> np.ndarray:
+        return np.roll(self.returns, -self.head, axis=0)
+
+    def covariance(self) -> np.ndarray:
+        n = self.window
+        return (self.sum_outer - np.outer(self.sum, self.sum) / n) / (n - 1)
+
+def aligned_returns(close: pd.DataFrame) -> pd.DataFrame:
+    """
+    Daily simple returns on a common calendar, starting once every column has listed.
+    A day a symbol didn't trade after that counts as no move.
+    """
+    start = close.apply(pd.Series.first_valid_index).max()
+    returns = close.ffill().pct_change()
+    return returns.loc[returns.index > start].fillna(0.0)
+
+# --- Panel Cache ---
+# Aligned close panels per holdings set. Daily history only changes at the last bar, which
+# with_latest_prices refreshes from quotes, so panels are rebuilt from charts only every few hours.
+PANEL_TTL_SECONDS = float(os.getenv("RISK_PANEL_TTL_SECONDS", str(6 * 3600)))
+PANEL_CACHE: "OrderedDict[Tuple[Tuple[str, ...], int], Tuple[pd.DataFrame, float]]" = OrderedDict()
+PANEL_CACHE_MAX_ENTRIES = 64
+
+def panel_key(tickers: List[str], years: int) -> Tuple[Tuple[str, ...], int]:
+    return tuple(sorted(set(tickers))), years
+
+def get_cached_panel(key: Tuple[Tuple[str, ...], int]) -> Tuple[Optional[pd.DataFrame], bool]:
+    """Returns (panel, fresh); a stale panel is still returned so it can be served while it is rebuilt."""
+    entry = PANEL_CACHE.get(key)
+    if entry is None:
+        return None, False
+    PANEL_CACHE.move_to_end(key)
+    return entry[0], entry[1] > time.time()
+
+def cache_panel(key: Tuple[Tuple[str, ...], int], close: pd.DataFrame):
+    PANEL_CACHE[key] = (close, time.time() + PANEL_TTL_SECONDS)
+    PANEL_CACHE.move_to_end(key)
+    while len(PANEL_CACHE) > PANEL_CACHE_MAX_ENTRIES:
+        PANEL_CACHE.popitem(last=False)
+
+def with_latest_prices(close: pd.DataFrame, latest: Dict[str, Tuple[float, pd.Timestamp]]) -> pd.DataFrame:
+    """
+    Overlays live prices, given as ticker -> (price, trading day), on the last bar of a close panel.
+    Prices from the panel's last day replace it; prices from a later day start a new bar.
+    """
+    if close.empty or not latest:
+        return close
+    last_day = close.index[-1]
+    newer = [day for _, day in latest.values() if day > last_day]
+    target = max(newer) if newer else last_day
+    updates = {t: price for t, (price, day) in latest.items() if day == target and t in close.columns}
+    if not updates:
+        return close
+    if target not in close.index:
+        close = pd.concat([close, pd.DataFrame(index=pd.DatetimeIndex([target], name=close.index.name), columns=close.columns, dtype=np.float64)])
+    else:
+        close = close.copy()
+    close.loc[target, list(updates)] = list(updates.values())
+    return close
+
+# (columns, window) -> RollingCovariance, least recently used first
+RISK_CACHE: "OrderedDict[Tuple[Tuple[str, ...], int], RollingCovariance]" = OrderedDict()
+RISK_CACHE_MAX_ENTRIES = 256
+
+def get_rolling_covariance(close: pd.DataFrame, window: int) -> Optional[RollingCovariance]:
+    """
+    Returns the cached rolling state for these columns and window, bringing it up to date
+    with the panel: the latest bar is refreshed and new trailing bars are pushed incrementally;
+    anything else (new holdings, a gap in history) rebuilds it.
+    """
+    returns = aligned_returns(close)
+    if len(returns) < window:
+        return None
+
+    columns = list(close.columns)
+    key = (tuple(columns), window)
+    state = RISK_CACHE.get(key)
+    if state is not None and state.last_date in returns.index:
+        RISK_CACHE.move_to_end(key)
+        new_rows = returns.loc[returns.index >= state.last_date]
+        for date, row in zip(new_rows.index, new_rows.to_numpy(dtype=np.float64)):
+            if date == state.last_date:
+                state.replace_latest(row)
+            else:
+                state.push(row, date)
+        return state
+
+    state = RollingCovariance(columns, returns.iloc[-window:].to_numpy(dtype=np.float64), returns.index[-1])
+    RISK_CACHE[key] = state
+    RISK_CACHE.move_to_end(key)
+    while len(RISK_CACHE) > RISK_CACHE_MAX_ENTRIES:
+        RISK_CACHE.popitem(last=False)
+    return state
+
+def portfolio_risk(close: pd.DataFrame, quantities: Dict[str, float], benchmark: str,
+                   window: int = 60, confidence: float = 0.95) -> Dict[str, Any]:
+    """
+    Risk analytics for a portfolio from a date x ticker close panel that includes the benchmark column.
+    Weights are current market values; volatility is annualized; VaR is one-day historical VaR.
+    """
+    bars = close.notna().sum()
+    short = [c for c in close.columns if bars[c] <= window]
+    if short:
+        # Counting pre-listing days as flat returns would understate their risk
+        raise ValueError(f"Not enough history for {', '.join(short)}: need {window + 1} daily bars, use a shorter window.")
+    state = get_rolling_covariance(close, window)
+    if state is None:
+        raise ValueError(f"Need at least {window + 1} aligned bars to compute risk.")
+
+    columns = state.columns
+    # The benchmark counts as a holding too when the portfolio owns it
+    holdings = [c for c in columns if c in quantities]
+    if not holdings:
+        raise ValueError("None of the holdings have price data.")
+    h = np.array([columns.index(c) for c in holdings], dtype=int)
+    b = columns.index(benchmark)
+
+    cov = state.covariance()
+    std = np.sqrt(np.clip(np.diag(cov), 0, None))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        corr = cov / np.outer(std, std)
+    corr = np.nan_to_num(corr[np.ix_(h, h)])
+
+    last_prices = close[holdings].ffill().iloc[-1].to_numpy(dtype=np.float64)
+    values = last_prices * np.array([quantities.get(c, 0.0) for c in holdings])
+    total_value = float(np.nansum(values))
+    weights = values / total_value if total_value else np.zeros(len(holdings))
+
+    cov_h = cov[np.ix_(h, h)]
+    portfolio_var = float(weights @ cov_h @ weights)
+    betas = cov[h, b] / cov[b, b] if cov[b, b] > 0 else np.zeros(len(holdings))
+
+    portfolio_returns = state.ordered_returns()[:, h] @ weights
+    var_pct = max(0.0, -float(np.percentile(portfolio_returns, (1 - confidence) * 100)))
+
+    return {
+        "as_of": state.last_date.strftime('%Y-%m-%d'),
+        "window": window,
+        "tickers": holdings,
+        "weights": {c: round(float(w), 4) for c, w in zip(holdings, weights)},
+        "volatility": {c: round(float(s * np.sqrt(TRADING_DAYS)), 4) for c, s in zip(holdings, std[h])},
+        "beta": {c: round(float(v), 4) for c, v in zip(holdings, betas)},
+        "correlation": np.round(corr, 4).tolist(),
+        "portfolio_value": round(total_value, 2),
+        "portfolio_volatility": round(float(np.sqrt(max(portfolio_var, 0.0)) * np.sqrt(TRADING_DAYS)), 4),
+        "portfolio_beta": round(float(weights @ betas), 4),
+        "var_confidence": confidence,
+        "var_pct": round(var_pct * 100, 4),
+        "var_amount": round(var_pct * total_value, 2),
+    }
@@ -1,4 +1,5 @@
 # backend/scoring.py (Final Version)
+import numpy as np
 import pandas as pd
 import logging
 
@@ -43,4 +44,42 @@ def generate_score(row: pd.Series) -> float:
 
     except Exception as e:
         logger.error(f"Error in generate_score for row {row.name}: {e}")
-        return 0.0
\ No newline at end of file
+        return 0.0
+
+def generate_scores(close: pd.DataFrame, volume: pd.DataFrame) -> pd.DataFrame:
+    """
+    Vectorized generate_score over a date x ticker panel, computing the same inputs
+    (EMA20/EMA50, RSI 14, lower Bollinger Band, volume spike ratio) for every column at once.
+    Each symbol is scored on its own bars: a column with gaps inside its history (a halt, or
+    days only other symbols traded) is scored on its valid rows and spread back onto the panel.
+    """
+    valid = close.notna().to_numpy()
+    # Pack each column's bars to the top (stable, so their order is kept), score the packed
+    # panel in one pass, then scatter the scores back to their dates
+    order = np.argsort(~valid, axis=0, kind='stable')
+    packed_close = pd.DataFrame(np.take_along_axis(close.to_numpy(dtype=np.float64), order, axis=0), columns=close.columns)
+    packed_volume = pd.DataFrame(np.take_along_axis(volume.to_numpy(dtype=np.float64), order, axis=0), columns=close.columns)
+    packed_scores = _score_panel(packed_close, packed_volume).to_numpy()
+
+    scores = np.zeros(close.shape)
+    np.put_along_axis(scores, order, packed_scores, axis=0)
+    return pd.DataFrame(np.where(valid, scores, 0.0), index=close.index, columns=close.columns)
+
+def _score_panel(close: pd.DataFrame, volume: pd.DataFrame) -> pd.DataFrame:
+    ema20 = close.ewm(span=20, adjust=False).mean()
+    ema50 = close.ewm(span=50, adjust=False).mean()
+
+    delta = close.diff()
+    gain = delta.clip(lower=0).ewm(alpha=1/14, adjust=False).mean()
+    loss = -delta.clip(upper=0).ewm(alpha=1/14, adjust=False).mean()
+    rsi = 100 - (100 / (1 + gain / loss))
+
+    bb_lower = close.rolling(window=20).mean() - 2 * close.rolling(window=20).std()
+    volume_spike = volume / volume.rolling(window=20).mean()
+
+    score = (ema20 > ema50) * 30.0
+    score += rsi.where(rsi.isna(), 15.0).mask(rsi < 30, 30.0).mask(rsi > 70, 5.0).fillna(0.0)
+    score += (close > bb_lower) * 20.0
+    score += (volume_spike > 1.8) * 20.0
+    score = score.clip(upper=100.0)
+    return score.where(close.notna() & ema20.notna() & ema50.notna(), 0.0)
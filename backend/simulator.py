@@ -0,0 +1,162 @@
+# backend/simulator.py
+"""
+Simulated yfapi.net backend for load testing without touching the real API.
+
+Serves /v8/finance/chart/{ticker} and /v6/finance/quote in the yfapi JSON shape from
+seeded synthetic prices, with configurable latency and error rates. Point the API at it with:
+
+    uvicorn simulator:app --port 8100
+    MARKET_DATA_BASE_URL=http://localhost:8100 uvicorn main:app --port 8000
+
+Configuration (environment):
+    SIM_SOURCE              "synthetic" (geometric Brownian motion) or "csv" (bootstraps the
+                            daily returns and volumes of sample_stock_data.csv)
+    SIM_SEED                base seed; each ticker derives its own from it (default 42)
+    SIM_HISTORY_YEARS       length of the "max" range (default 10)
+    SIM_LATENCY_MS          mean added latency per response (default 80)
+    SIM_LATENCY_JITTER_MS   standard deviation of the latency (default 30)
+    SIM_ERROR_RATE          fraction of requests answered with HTTP 500 (default 0)
+    SIM_THROTTLE_RATE       fraction of requests answered with HTTP 429 (default 0)
+"""
+import asyncio
+import os
+import random
+import zlib
+from functools import lru_cache
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+from fastapi import FastAPI, HTTPException, Query
+
+SOURCE = os.getenv("SIM_SOURCE", "synthetic")
+SEED = int(os.getenv("SIM_SEED", "42"))
+HISTORY_YEARS = int(os.getenv("SIM_HISTORY_YEARS", "10"))
+LATENCY_MS = float(os.getenv("SIM_LATENCY_MS", "80"))
+LATENCY_JITTER_MS = float(os.getenv("SIM_LATENCY_JITTER_MS", "30"))
+ERROR_RATE = float(os.getenv("SIM_ERROR_RATE", "0"))
+THROTTLE_RATE = float(os.getenv("SIM_THROTTLE_RATE", "0"))
+
+SAMPLE_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sample_stock_data.csv")
+MARKET_TZ = "Asia/Kolkata"
+SESSION_OPEN, SESSION_CLOSE = "09:15", "15:30"
+
+RANGE_OFFSETS = {
+    "1d": pd.DateOffset(days=1), "5d": pd.DateOffset(days=7), "1mo": pd.DateOffset(months=1),
+    "6mo": pd.DateOffset(months=6), "1y": pd.DateOffset(years=1), "5y": pd.DateOffset(years=5),
+}
+INTRADAY_MINUTES = {"5m": 5, "30m": 30, "90m": 90}
+CALENDAR_RULES = {"1wk": "W-MON", "1mo": "MS"}
+
+app = FastAPI(title="StockIQ upstream simulator")
+
+def _ticker_rng(ticker: str, salt: str) -> np.random.Generator:
+    return np.random.default_rng([SEED, zlib.crc32(ticker.upper().encode()), zlib.crc32(salt.encode())])
+
+@lru_cache(maxsize=1)
+def _sample_returns():
+    df = pd.read_csv(SAMPLE_CSV, skiprows=3, names=["Date", "Close", "High", "Low", "Open", "Volume"])
+    log_returns = np.diff(np.log(df["Close"].to_numpy()))
+    spread = ((df["High"] - df["Low"]) / df["Close"]).to_numpy()
+    return log_returns, spread[1:], df["Volume"].to_numpy()[1:]
+
+@lru_cache(maxsize=4096)
+def daily_bars(ticker: str) -> pd.DataFrame:
+    rng = _ticker_rng(ticker, "daily")
+    end = pd.Timestamp.now(tz=MARKET_TZ).normalize()
+    days = pd.bdate_range(end=end, periods=252 * HISTORY_YEARS, tz=MARKET_TZ) + pd.Timedelta(hours=9, minutes=15)
+    n = len(days)
+    if SOURCE == "csv":
+        log_returns, spreads, volumes = _sample_returns()
+        picks = rng.integers(0, len(log_returns), n)
+        returns, spread, volume = log_returns[picks], spreads[picks], volumes[picks] * rng.uniform(0.05, 0.5)
+    else:
+        returns = rng.normal(0.0003, rng.uniform(0.01, 0.03), n)
+        spread = np.abs(rng.normal(0.015, 0.005, n))
+        volume = rng.lognormal(13, 0.6, n)
+    close = rng.uniform(50, 3000) * np.exp(np.cumsum(returns))
+    open_ = np.concatenate(([close[0]], close[:-1])) * np.exp(rng.normal(0, 0.003, n))
+    high = np.maximum(open_, close) * (1 + spread * rng.uniform(0.2, 0.6, n))
+    low = np.minimum(open_, close) * (1 - spread * rng.uniform(0.2, 0.6, n))
+    return pd.DataFrame({"Date": days, "Open": open_, "High": high, "Low": low, "Close": close,
+                         "Volume": volume.astype(np.int64)})
+
+@lru_cache(maxsize=4096)
+def intraday_bars(ticker: str, minutes: int) -> pd.DataFrame:
+    """Bars for the last two months of sessions, walking from the previous daily close."""
+    daily = daily_bars(ticker).iloc[-45:]
+    rng = _ticker_rng(ticker, f"intraday{minutes}")
+    frames = []
+    for day, prev_close, volume in zip(daily["Date"], daily["Close"].shift(1).fillna(daily["Open"]), daily["Volume"]):
+        session = pd.date_range(f"{day.date()} {SESSION_OPEN}", f"{day.date()} {SESSION_CLOSE}",
+                                freq=f"{minutes}min", tz=MARKET_TZ, inclusive="left")
+        close = prev_close * np.exp(np.cumsum(rng.normal(0, 0.002 * np.sqrt(minutes / 5), len(session))))
+        open_ = np.concatenate(([prev_close], close[:-1]))
+        wiggle = np.abs(rng.normal(0, 0.001, len(session)))
+        frames.append(pd.DataFrame({
+            "Date": session, "Open": open_, "High": np.maximum(open_, close) * (1 + wiggle),
+            "Low": np.minimum(open_, close) * (1 - wiggle), "Close": close,
+            "Volume": rng.multinomial(int(volume), np.full(len(session), 1 / len(session))),
+        }))
+    bars = pd.concat(frames, ignore_index=True)
+    return bars[bars["Date"] <= pd.Timestamp.now(tz=MARKET_TZ)].reset_index(drop=True)
+
+def chart_bars(ticker: str, range_: str, interval: str) -> pd.DataFrame:
+    if interval in INTRADAY_MINUTES:
+        df = intraday_bars(ticker, INTRADAY_MINUTES[interval])
+    else:
+        df = daily_bars(ticker)
+        if interval in CALENDAR_RULES:
+            df = (df.resample(CALENDAR_RULES[interval], on="Date", closed="left", label="left")
+                    .agg({"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"})
+                    .dropna(subset=["Close"]).reset_index())
+    if range_ in RANGE_OFFSETS:
+        df = df[df["Date"] > df["Date"].iloc[-1] - RANGE_OFFSETS[range_]]
+    return df
+
+async def _simulate_network():
+    delay = max(0.0, random.gauss(LATENCY_MS, LATENCY_JITTER_MS)) / 1000
+    await asyncio.sleep(delay)
+    roll = random.random()
+    if roll < THROTTLE_RATE:
+        raise HTTPException(status_code=429, detail="Simulated quota exceeded")
+    if roll < THROTTLE_RATE + ERROR_RATE:
+        raise HTTPException(status_code=500, detail="Simulated upstream error")
+
+@app.get("/v8/finance/chart/{ticker}")
+async def chart(ticker: str, range: str = "1mo", interval: str = "1d") -> Dict[str, Any]:
+    await _simulate_network()
+    df = chart_bars(ticker, range, interval)
+    return {"chart": {"result": [{
+        "meta": {"symbol": ticker.upper(), "currency": "INR", "exchangeTimezoneName": MARKET_TZ,
+                 "dataGranularity": interval, "range": range},
+        "timestamp": (df["Date"].astype("int64") // 10**9).tolist(),
+        "indicators": {"quote": [{
+            "open": df["Open"].round(2).tolist(), "high": df["High"].round(2).tolist(),
+            "low": df["Low"].round(2).tolist(), "close": df["Close"].round(2).tolist(),
+            "volume": df["Volume"].astype(int).tolist(),
+        }]},
+    }], "error": None}}
+
+def _quote(symbol: str) -> Dict[str, Any]:
+    daily = daily_bars(symbol)
+    last, previous = daily.iloc[-1], daily.iloc[-2]
+    rng = _ticker_rng(symbol, "profile")
+    change = float(last["Close"] - previous["Close"])
+    return {
+        "symbol": symbol.upper(),
+        "regularMarketPrice": round(float(last["Close"]), 2),
+        "regularMarketPreviousClose": round(float(previous["Close"]), 2),
+        "regularMarketChange": round(change, 2),
+        "regularMarketChangePercent": round(change / float(previous["Close"]) * 100, 4),
+        "regularMarketTime": int(min(last["Date"] + pd.Timedelta(hours=6, minutes=15), pd.Timestamp.now(tz=MARKET_TZ)).timestamp()),
+        "marketCap": int(float(last["Close"]) * rng.integers(10**7, 10**10)),
+        "trailingPE": round(float(rng.uniform(8, 60)), 2),
+        "firstTradeDateMilliseconds": int(daily["Date"].iloc[0].timestamp() * 1000),
+    }
+
+@app.get("/v6/finance/quote")
+async def quote(symbols: str = Query(...)) -> Dict[str, Any]:
+    await _simulate_network()
+    requested: List[str] = [s for s in symbols.split(",") if s]
+    return {"quoteResponse": {"result": [_quote(s) for s in requested], "error": None}}
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import backtester
+import scoring
+
+def _panel(scores, closes):
+    """Flat prices at 100 (high 101, low 99) unless overridden, with fixed scores per day."""
+    dates = pd.bdate_range("2024-01-01", periods=len(next(iter(scores.values()))))
+    close = pd.DataFrame(closes, index=dates)
+    panel = {
+        "Close": close, "High": close * 1.01, "Low": close * 0.99,
+        "Open": close, "Volume": close * 0 + 1000,
+    }
+    return panel, pd.DataFrame(scores, index=dates).where(close.notna(), 0.0)
+
+@pytest.fixture
+def fixed_scores(monkeypatch):
+    def install(scores):
+        monkeypatch.setattr(scoring, "generate_scores", lambda close, volume: scores)
+    return install
+
+def test_exits_position_cap_and_cash(fixed_scores):
+    n = 10
+    flat = [100.0] * n
+    closes = {"A": list(flat), "B": list(flat), "C": list(flat)}
+    scores = {"A": [90] + [0] * (n - 1), "B": [80] + [0] * (n - 1), "C": [70, 0, 0, 0, 70] + [0] * (n - 5)}
+    panel, score_frame = _panel(scores, closes)
+    panel["High"].iloc[2, 0] = 111.0   # A: take profit at 110 on day 2
+    panel["Low"].iloc[3, 1] = 94.0     # B: stop loss at 95 on day 3
+    panel["Close"].iloc[5, 2] = np.nan  # C: halted on day 5, which must not count as a held bar
+    panel["High"].iloc[5, 2] = panel["Low"].iloc[5, 2] = np.nan
+    panel["Close"].iloc[8, 2] = 102.0
+    fixed_scores(score_frame)
+
+    report = backtester.backtest_portfolio(panel, holding_days=3, min_score=50, stop_loss_pct=5, take_profit_pct=10,
+                                           initial_capital=1000.0, max_positions=2)
+    trades = {t["Ticker"]: t for t in report["trades"]}
+
+    # only two slots on day 0: C waits despite qualifying
+    assert trades["A"]["Buy Date"] == trades["B"]["Buy Date"] == "2024-01-01"
+    assert (trades["A"]["Sell Date"], trades["A"]["Sell Price"], trades["A"]["Exit Reason"]) == ("2024-01-03", 110.0, "Take Profit Hit")
+    assert (trades["B"]["Sell Date"], trades["B"]["Sell Price"], trades["B"]["Exit Reason"]) == ("2024-01-04", 95.0, "Stop Loss Hit")
+    # C enters on day 4 and times out after three of its own bars (days 6, 7, 8)
+    assert (trades["C"]["Buy Date"], trades["C"]["Sell Date"]) == ("2024-01-05", "2024-01-11")
+    assert trades["C"]["Exit Reason"] == "Held for 3 days"
+
+    # 500 -> 550 and 500 -> 475 leaves 1025; half of it goes into C at 100 and comes back at 102
+    expected_final = 1025.0 - 512.5 + 512.5 * 1.02
+    assert report["summary"]["final_equity"] == pytest.approx(expected_final, abs=0.01)
+    assert report["summary"]["total_trades"] == 3
+    assert report["summary"]["open_positions"] == []
+    equity = [point["Equity"] for point in report["equity_curve"]]
+    assert equity[0] == 1000.0 and equity[3] == 1025.0
+
+def test_never_holds_more_than_max_positions(fixed_scores):
+    n = 30
+    rng = np.random.default_rng(2)
+    tickers = [f"S{i}" for i in range(8)]
+    closes = {t: list(100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))) for t in tickers}
+    # nothing qualifies in the last week, so every position has timed out by the end
+    scores = {t: list(rng.choice([0.0, 80.0], n - 6)) + [0.0] * 6 for t in tickers}
+    panel, score_frame = _panel(scores, closes)
+    fixed_scores(score_frame)
+
+    report = backtester.backtest_portfolio(panel, holding_days=5, min_score=50, initial_capital=10_000.0, max_positions=3)
+    assert report["summary"]["open_positions"] == []
+    trades = pd.DataFrame(report["trades"])
+    held = [((trades["Buy Date"] <= day) & (trades["Sell Date"] > day)).sum() for day in panel["Close"].index.strftime("%Y-%m-%d")]
+    assert max(held) == 3
+    assert report["equity_curve"][-1]["Equity"] == report["summary"]["final_equity"] > 0
+
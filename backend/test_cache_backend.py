@@ -0,0 +1,129 @@
+import asyncio
+import socketserver
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import cache_backend
+
+def _frame():
+    return pd.DataFrame({
+        "Date": pd.date_range("2024-01-01 09:15", periods=4, freq="D"),
+        "Open": [1.0, 2.0, np.nan, 4.0],
+        "Volume": np.array([10, 20, 30, 40], dtype=np.int64),
+        "Signal": ["BUY", None, "SELL", "HOLD"],
+    })
+
+def test_frame_round_trip_keeps_dtypes_and_values():
+    df = _frame()
+    restored = cache_backend.deserialize(cache_backend.serialize(df))
+    pd.testing.assert_frame_equal(restored, df)
+
+def test_json_values_round_trip():
+    value = {"symbol": "TCS.NS", "currentPrice": 3890.5, "history": [1, 2, 3]}
+    assert cache_backend.deserialize(cache_backend.serialize(value)) == value
+
+def test_unknown_payload_is_rejected():
+    with pytest.raises(ValueError):
+        cache_backend.deserialize(b"XXXXnot a cache entry")
+
+def test_sqlite_tier_shares_entries_and_honours_ttl(tmp_path):
+    path = str(tmp_path / "cache.db")
+    writer, reader = cache_backend.SQLiteCache(path), cache_backend.SQLiteCache(path)
+    writer.set("history_TCS.NS_1Y", _frame(), ttl=60)
+    writer.set("expired", {"a": 1}, ttl=-1)
+
+    value, expires = reader.get("history_TCS.NS_1Y")
+    pd.testing.assert_frame_equal(value, _frame())
+    assert expires > time.time()
+    assert reader.get("expired") is None
+    assert reader.get("missing") is None
+
+# --- Redis stand-in ---
+class _RespHandler(socketserver.StreamRequestHandler):
+    """Understands just the GET / SET PX / PTTL commands RedisCache sends."""
+
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        parts = []
+        for _ in range(int(line[1:-2])):
+            length = int(self.rfile.readline()[1:-2])
+            parts.append(self.rfile.read(length + 2)[:-2])
+        return parts
+
+    def handle(self):
+        store = self.server.store
+        while True:
+            command = self._read_command()
+            if command is None:
+                return
+            name, key = command[0].upper(), command[1]
+            entry = store.get(key)
+            if entry is not None and entry[1] <= time.time():
+                store.pop(key)
+                entry = None
+            if name == b"SET":
+                store[key] = (command[2], time.time() + int(command[4]) / 1000)
+                self.wfile.write(b"+OK\r\n")
+            elif name == b"GET":
+                self.wfile.write(b"$-1\r\n" if entry is None else b"$%d\r\n%s\r\n" % (len(entry[0]), entry[0]))
+            elif name == b"PTTL":
+                self.wfile.write(b":%d\r\n" % (-2 if entry is None else int((entry[1] - time.time()) * 1000)))
+            else:
+                self.wfile.write(b"-ERR unknown command\r\n")
+
+@pytest.fixture
+def resp_server():
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _RespHandler)
+    server.daemon_threads = True
+    server.store = {}
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def test_redis_tier_round_trip(resp_server):
+    cache = cache_backend.RedisCache(*resp_server.server_address)
+    cache.set("history_TCS.NS_1Y", _frame(), ttl=60)
+    cache.set("info_TCS.NS", {"currentPrice": 3890.5}, ttl=60)
+
+    value, expires = cache.get("history_TCS.NS_1Y")
+    pd.testing.assert_frame_equal(value, _frame())
+    assert time.time() < expires <= time.time() + 60
+    assert cache.get("info_TCS.NS")[0] == {"currentPrice": 3890.5}
+    assert cache.get("missing") is None
+
+def test_tiered_cache_promotes_shared_hits(resp_server):
+    shared = cache_backend.RedisCache(*resp_server.server_address)
+    shared.set("info_TCS.NS", {"currentPrice": 1.0}, ttl=60)
+    cache = cache_backend.TieredCache(shared)
+
+    async def lookups():
+        return [await cache.get("info_TCS.NS"), await cache.get("info_TCS.NS"), await cache.get("missing")]
+
+    assert asyncio.run(lookups()) == [({"currentPrice": 1.0}, "l2"), ({"currentPrice": 1.0}, "l1"), (None, "miss")]
+
+def test_tiered_cache_bypasses_unreachable_shared_tier():
+    class Unreachable:
+        calls = 0
+
+        def get(self, key, *args):
+            Unreachable.calls += 1
+            raise ConnectionRefusedError("no server")
+
+        set = get
+
+    cache = cache_backend.TieredCache(Unreachable(), failure_cooldown=60)
+
+    async def lookups():
+        await cache.set("a", 1, ttl=60)
+        return [await cache.get("a"), await cache.get("b"), await cache.get("c")]
+
+    assert asyncio.run(lookups()) == [(1, "l1"), (None, "miss"), (None, "miss")]
+    assert Unreachable.calls == 1
@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import downsample
+
+def _frame(n: int = 1000) -> pd.DataFrame:
+    rng = np.random.default_rng(9)
+    close = 100 + np.cumsum(rng.normal(0, 1, n))
+    return pd.DataFrame({
+        "Open": close, "High": close + rng.uniform(0, 3, n), "Low": close - rng.uniform(0, 3, n),
+        "Close": close, "Volume": rng.integers(100, 10_000, n), "SMA_20": pd.Series(close).rolling(20).mean().to_numpy(),
+    }, index=pd.date_range("2024-01-01", periods=n, freq="5min", name="Date"))
+
+@pytest.mark.parametrize("n, threshold", [(1000, 50), (1000, 3), (101, 100), (5000, 777)])
+def test_lttb_keeps_threshold_increasing_indices_with_endpoints(n, threshold):
+    y = np.sin(np.linspace(0, 20, n)) + np.random.default_rng(n).normal(0, 0.1, n)
+    indices = downsample.lttb_indices(np.arange(n, dtype=np.float64), y, threshold)
+    assert len(indices) == threshold
+    assert np.all(np.diff(indices) > 0)
+    assert indices[0] == 0 and indices[-1] == n - 1
+
+def test_lttb_keeps_every_point_when_under_threshold():
+    y = np.arange(10, dtype=np.float64)
+    np.testing.assert_array_equal(downsample.lttb_indices(y, y, 10), np.arange(10))
+    np.testing.assert_array_equal(downsample.lttb_indices(y, y, 50), np.arange(10))
+
+def test_lttb_keeps_a_spike():
+    y = np.zeros(1000)
+    y[537] = 100.0
+    assert 537 in downsample.lttb_indices(np.arange(1000, dtype=np.float64), y, 20)
+
+def test_downsample_frame_aggregates_each_bucket():
+    df = _frame()
+    out = downsample.downsample_frame(df, 50)
+    assert len(out) == 50
+
+    starts = downsample._bucket_starts(len(df), 50)
+    bounds = list(zip(starts, list(starts[1:]) + [len(df)]))
+    for (start, end), (date, row) in zip(bounds, out.iterrows()):
+        bucket = df.iloc[start:end]
+        assert bucket.index[0] <= date <= bucket.index[-1]
+        assert row["High"] == bucket["High"].max()
+        assert row["Low"] == bucket["Low"].min()
+        assert row["Volume"] == bucket["Volume"].sum()
+        # everything else comes from the kept bar itself
+        assert row["Close"] == df.loc[date, "Close"]
+        assert row["SMA_20"] == df.loc[date, "SMA_20"] or np.isnan(row["SMA_20"])
+    assert out["Volume"].sum() == df["Volume"].sum()
+
+def test_downsample_frame_leaves_short_frames_alone():
+    df = _frame(40)
+    assert downsample.downsample_frame(df, 50) is df
+    assert downsample.downsample_frame(df, None) is df
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import formula
+import indicators
+
+def _frame(n: int = 60) -> pd.DataFrame:
+    rng = np.random.default_rng(3)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    return pd.DataFrame({
+        "Open": close, "High": close * 1.01, "Low": close * 0.99, "Close": close,
+        "Volume": rng.integers(1_000, 10_000, n),
+    }, index=pd.date_range("2024-01-01", periods=n, freq="D", name="Date"))
+
+def test_ema_minus_sma_matches_pandas():
+    df = _frame()
+    result = formula.compile_formula("ema(close, 9) - sma(close, 21)").evaluate(df)
+    expected = df["Close"].ewm(span=9, adjust=False).mean() - df["Close"].rolling(window=21).mean()
+    pd.testing.assert_series_equal(result, expected, check_names=False)
+
+def test_constant_subexpressions_evaluate_without_raising():
+    df = _frame()
+    result = formula.compile_formula("close + 1 / 0 + (2 > 1)").evaluate(df)
+    assert result.isna().all()  # inf is reported as missing
+    flag = formula.compile_formula("(close > 0) + (1 > 2)").evaluate(df)
+    assert (flag == 1.0).all()
+
+def test_shared_subexpressions_compile_once():
+    plan = formula.compile_formula("sma(close, 20) / sma(close, 20) + sma(close, 20)")
+    assert sum(1 for step in plan.steps if step[0] == "call") == 1
+
+@pytest.mark.parametrize("expression", [
+    "close.__class__",
+    "__import__('os').system('true')",
+    "(lambda: close)()",
+    "close ** 2",
+    "open(close)",
+    "sma(close, n=5)",
+    "sma(close, 5.5)",
+    "sma(close, 100000)",
+    "sma(close, 0)",
+    "[close]",
+    "close if close > 1 else open",
+    "price",
+    "abs(" * 70 + "close" + ")" * 70,
+    "x" * (formula.MAX_EXPRESSION_LENGTH + 1),
+    "close +",
+    "close * " + "9" * 400,
+    "1 / 0",
+    "1 > 2",
+    "-3",
+])
+def test_rejected_expressions(expression):
+    with pytest.raises(formula.FormulaError):
+        formula.compile_formula(expression)
+
+def test_custom_label_cannot_shadow_price_columns():
+    with pytest.raises(formula.FormulaError):
+        indicators.validate_custom({"expr": "sma(close, 5)", "label": "Close"})
+
+def test_custom_indicator_adds_labelled_column():
+    df = _frame()
+    out = indicators.calculate_indicators(df, [{"name": "Custom", "params": {"expr": "zscore(volume, 20)", "label": "VolZ"}}])
+    assert "VolZ" in out.columns
+    pd.testing.assert_series_equal(out["Close"], df["Close"])
@@ -0,0 +1,28 @@
+import numpy as np
+import pandas as pd
+
+import indicators
+
+def _weekly_frame(last_close: float) -> pd.DataFrame:
+    closes = [141.0, 143.0, 145.0, 147.0, 149.0]
+    closes[-1] = last_close
+    return pd.DataFrame({
+        "Open": closes, "High": [c + 1 for c in closes], "Low": [c - 1 for c in closes],
+        "Close": closes, "Volume": np.arange(1, 6, dtype=np.int64) * 100,
+    }, index=pd.date_range("2024-01-01", periods=5, freq="W-MON", name="Date"))
+
+def test_cached_indicators_follow_updates_to_the_last_bar():
+    specs = [{"name": "SMA", "params": {"period": 5}}]
+    first = indicators.calculate_indicators(_weekly_frame(149.0), specs, cache_key=("TEST.NS", "5Y"))
+    assert first["SMA_5"].iloc[-1] == 145.0
+
+    # same timestamp and bar count, the open week's close moved
+    updated = indicators.calculate_indicators(_weekly_frame(500.0), specs, cache_key=("TEST.NS", "5Y"))
+    assert updated["SMA_5"].iloc[-1] == (141.0 + 143.0 + 145.0 + 147.0 + 500.0) / 5
+
+def test_cache_hit_matches_fresh_computation():
+    specs = [{"name": "EMA", "params": {"period": 3}}, {"name": "RSI", "params": {"period": 2}}]
+    fresh = indicators.calculate_indicators(_weekly_frame(149.0), specs)
+    indicators.calculate_indicators(_weekly_frame(149.0), specs, cache_key=("HIT.NS", "5Y"))
+    cached = indicators.calculate_indicators(_weekly_frame(149.0), specs, cache_key=("HIT.NS", "5Y"))
+    pd.testing.assert_frame_equal(cached, fresh)
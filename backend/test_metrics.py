@@ -0,0 +1,66 @@
+import asyncio
+import time
+
+import pytest
+
+import metrics
+
+def test_histogram_renders_cumulative_buckets():
+    histogram = metrics.Histogram("test_render_seconds", "Test histogram.", ("endpoint",), buckets=(0.01, 0.1, 1.0))
+    for value in (0.005, 0.05, 0.07, 5.0):
+        histogram.observe(value, endpoint="/analyze")
+
+    lines = [line for line in metrics.render_prometheus().splitlines() if line.startswith("test_render_seconds")]
+    assert lines == [
+        'test_render_seconds_bucket{endpoint="/analyze",le="0.01"} 1.0',
+        'test_render_seconds_bucket{endpoint="/analyze",le="0.1"} 3.0',
+        'test_render_seconds_bucket{endpoint="/analyze",le="1.0"} 3.0',
+        'test_render_seconds_bucket{endpoint="/analyze",le="+Inf"} 4.0',
+        f'test_render_seconds_sum{{endpoint="/analyze"}} {0.005 + 0.05 + 0.07 + 5.0}',
+        'test_render_seconds_count{endpoint="/analyze"} 4.0',
+    ]
+    assert "# TYPE test_render_seconds histogram" in metrics.render_prometheus()
+
+def test_counter_and_gauge_render_one_line_per_label_set():
+    counter = metrics.Counter("test_render_total", "Test counter.", ("upstream",))
+    counter.inc(upstream="chart")
+    counter.inc(2, upstream="chart")
+    counter.inc(upstream="quote")
+    gauge = metrics.Gauge("test_render_gauge", "Test gauge.")
+    gauge.set(0.5)
+    gauge.set(0.25)
+
+    text = metrics.render_prometheus()
+    assert 'test_render_total{upstream="chart"} 3.0' in text
+    assert 'test_render_total{upstream="quote"} 1.0' in text
+    assert "test_render_gauge 0.25" in text
+
+def test_profiler_samples_to_thread_workers():
+    def upstream_call():
+        deadline = time.perf_counter() + 0.2
+        while time.perf_counter() < deadline:
+            pass
+
+    async def handler():
+        profiler = metrics.SamplingProfiler(__import__("threading").get_ident(), interval=0.002)
+        profiler.start()
+        await asyncio.to_thread(upstream_call)
+        return profiler.stop()
+
+    report = asyncio.run(handler())
+    assert any(line.startswith("worker;") and "upstream_call" in line for line in report.splitlines())
+    assert any(line.startswith("event-loop;") for line in report.splitlines())
+
+def test_request_metrics_use_route_labels():
+    main = pytest.importorskip("main")
+    from fastapi.testclient import TestClient
+
+    client = TestClient(main.app)
+    client.get("/")
+    client.get("/no-such-page/12345")
+
+    text = metrics.render_prometheus()
+    assert 'stockiq_request_seconds_count{method="GET",endpoint="/",status="200"}' in text
+    assert 'stockiq_request_seconds_count{method="GET",endpoint="other",status="404"}' in text
+    assert "/no-such-page" not in text
+    assert main.endpoint_label("/analyze") == "/analyze"
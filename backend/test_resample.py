@@ -0,0 +1,68 @@
+import time
+from datetime import datetime
+
+import pandas as pd
+
+import fetch_data
+
+def _chart(bar_times, opens, highs, lows, closes, volumes):
+    """Builds a /v8/finance/chart result in the shape yfapi.net returns it."""
+    return {
+        "timestamp": [int(time.mktime(t.timetuple())) for t in bar_times],
+        "indicators": {"quote": [{"open": opens, "high": highs, "low": lows, "close": closes, "volume": volumes}]},
+    }
+
+def _daily_fixture():
+    days = [datetime(2024, 1, d, 9, 15) for d in (1, 2, 3, 4, 5, 8, 9, 10, 11, 12)] + [datetime(2024, 2, 1, 9, 15)]
+    n = len(days)
+    opens = [float(10 + i) for i in range(n)]
+    highs = [o + 2 for o in opens]
+    lows = [o - 1 for o in opens]
+    closes = [o + 0.5 for o in opens]
+    volumes = [100 * (i + 1) for i in range(n)]
+    # a bar with a missing close must be dropped, as upstream occasionally sends nulls
+    closes[3] = None
+    return _chart(days, opens, highs, lows, closes, volumes)
+
+def test_weekly_bars_match_ohlcv_aggregation():
+    df = fetch_data.chart_to_frame(_daily_fixture())
+    weekly = fetch_data.resample_ohlcv(df, "W-MON")
+
+    assert list(weekly['Date']) == [pd.Timestamp(2024, 1, 1), pd.Timestamp(2024, 1, 8), pd.Timestamp(2024, 1, 29)]
+    first = weekly.iloc[0]
+    assert first['Open'] == 10.0
+    assert first['High'] == 16.0
+    assert first['Low'] == 9.0
+    assert first['Close'] == 14.5
+    assert first['Volume'] == 100 + 200 + 300 + 500
+
+def test_monthly_bars_skip_empty_months():
+    df = fetch_data.chart_to_frame(_daily_fixture())
+    monthly = fetch_data.resample_ohlcv(df, "MS")
+
+    assert list(monthly['Date']) == [pd.Timestamp(2024, 1, 1), pd.Timestamp(2024, 2, 1)]
+    assert monthly.iloc[0]['Close'] == 19.5
+    assert monthly.iloc[1]['Open'] == 20.0
+
+def test_intraday_bars_are_anchored_at_session_open():
+    bars = [datetime(2024, 3, day, 9, 15) + pd.Timedelta(minutes=5 * i) for day in (26, 27) for i in range(75)]
+    values = [float(i) for i in range(len(bars))]
+    df = fetch_data.chart_to_frame(_chart(bars, values, values, values, values, [1] * len(bars)))
+
+    half_hourly = fetch_data.resample_ohlcv(df, "30min")
+    second_day = half_hourly[half_hourly['Date'].dt.day == 27]
+    assert second_day['Date'].iloc[0] == pd.Timestamp(2024, 3, 27, 9, 15)
+    assert second_day['Open'].iloc[0] == 75.0
+    assert second_day['Close'].iloc[0] == 80.0
+    assert second_day['Volume'].iloc[0] == 6
+
+    last_session = fetch_data.slice_range(df, sessions=1)
+    assert len(last_session) == 75
+    assert last_session['Date'].dt.day.unique().tolist() == [27]
+
+def test_offset_slice_is_relative_to_last_bar():
+    df = fetch_data.chart_to_frame(_daily_fixture())
+    recent = fetch_data.slice_range(df, offset=pd.DateOffset(days=7))
+
+    assert recent['Date'].iloc[0] == pd.Timestamp(2024, 2, 1, 9, 15)
+    assert len(recent) == 1
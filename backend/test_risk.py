@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import risk
+
+def _close(columns, n=400, seed=5):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range("2022-01-03", periods=n)
+    returns = rng.multivariate_normal(np.zeros(len(columns)), 0.0001 * (np.eye(len(columns)) + 0.5), n)
+    return pd.DataFrame(100 * np.exp(np.cumsum(returns, axis=0)), index=dates, columns=columns)
+
+def _expected_cov(close, window):
+    return np.cov(risk.aligned_returns(close).iloc[-window:].to_numpy().T)
+
+def test_incremental_updates_match_full_recomputation():
+    columns = ["INC_A", "INC_B", "INC_C", "^INC"]
+    full = _close(columns)
+    window = 60
+    start = 100
+
+    state = risk.get_rolling_covariance(full.iloc[:start], window)
+    np.testing.assert_allclose(state.covariance(), _expected_cov(full.iloc[:start], window), rtol=1e-9)
+
+    # new bars arrive one or a few at a time, well past a full rebuild cycle
+    end = start
+    while end < len(full):
+        end = min(len(full), end + (1 if end % 3 else 2))
+        state = risk.get_rolling_covariance(full.iloc[:end], window)
+        np.testing.assert_allclose(state.covariance(), _expected_cov(full.iloc[:end], window), rtol=1e-9, atol=1e-15)
+    assert state.last_date == full.index[-1]
+
+    # today's bar keeps changing until the close
+    live = full.copy()
+    live.iloc[-1] *= [1.02, 0.97, 1.0, 1.01]
+    state = risk.get_rolling_covariance(live, window)
+    np.testing.assert_allclose(state.covariance(), _expected_cov(live, window), rtol=1e-9, atol=1e-15)
+
+def test_benchmark_can_be_a_holding():
+    close = _close(["BM_A", "^BM"])
+    report = risk.portfolio_risk(close, {"BM_A": 10, "^BM": 5}, "^BM", window=60)
+    assert report["tickers"] == ["BM_A", "^BM"]
+    assert report["beta"]["^BM"] == pytest.approx(1.0)
+    assert sum(report["weights"].values()) == pytest.approx(1.0, abs=1e-3)
+
+def test_no_holdings_with_data_is_a_value_error():
+    close = _close(["EMPTY_A", "^EMPTY"])
+    with pytest.raises(ValueError):
+        risk.portfolio_risk(close[["^EMPTY"]], {"EMPTY_A": 10}, "^EMPTY", window=60)
+
+def test_pre_listing_days_are_not_counted_as_flat_returns():
+    close = _close(["LATE_A", "LATE_B", "^LATE"], n=300)
+    close.iloc[:200, 1] = np.nan  # LATE_B lists 200 days in
+    returns = risk.aligned_returns(close)
+    assert returns.index[0] > close.index[200]
+    assert len(returns) == 99
+
+    with pytest.raises(ValueError, match="LATE_B"):
+        risk.portfolio_risk(close, {"LATE_A": 1, "LATE_B": 1}, "^LATE", window=120)
+    report = risk.portfolio_risk(close, {"LATE_A": 1, "LATE_B": 1}, "^LATE", window=60)
+    expected = np.cov(close.iloc[200:].pct_change().iloc[-60:].to_numpy().T)
+    assert report["volatility"]["LATE_B"] == pytest.approx(np.sqrt(expected[1, 1] * risk.TRADING_DAYS), abs=1e-4)
+
+def test_latest_prices_update_or_extend_the_last_bar():
+    close = _close(["LIVE_A", "LIVE_B"], n=5)
+    last = close.index[-1]
+    next_day = last + pd.offsets.BDay()
+
+    same_day = risk.with_latest_prices(close, {"LIVE_A": (123.0, last), "LIVE_B": (50.0, last - pd.offsets.BDay())})
+    assert same_day.shape == close.shape
+    assert same_day.loc[last, "LIVE_A"] == 123.0
+    assert same_day.loc[last, "LIVE_B"] == close.loc[last, "LIVE_B"]
+    assert close.loc[last, "LIVE_A"] != 123.0  # the cached panel is not modified
+
+    extended = risk.with_latest_prices(close, {"LIVE_A": (123.0, next_day), "LIVE_B": (77.0, last)})
+    assert list(extended.index) == list(close.index) + [next_day]
+    assert extended.loc[next_day, "LIVE_A"] == 123.0 and np.isnan(extended.loc[next_day, "LIVE_B"])
+
+def test_panel_cache_serves_stale_panels(monkeypatch):
+    close = _close(["PC_A", "^PC"], n=5)
+    key = risk.panel_key(["^PC", "PC_A", "PC_A"], 2)
+    assert key == (("PC_A", "^PC"), 2)
+    assert risk.get_cached_panel(key) == (None, False)
+
+    risk.cache_panel(key, close)
+    panel, fresh = risk.get_cached_panel(key)
+    assert panel is close and fresh
+
+    monkeypatch.setattr(risk.time, "time", lambda: 1e12)
+    panel, fresh = risk.get_cached_panel(key)
+    assert panel is close and not fresh
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+
+import scoring
+
+def _panel(n: int = 300):
+    rng = np.random.default_rng(11)
+    dates = pd.bdate_range("2023-01-02", periods=n)
+    close = pd.DataFrame(100 * np.exp(np.cumsum(rng.normal(0, 0.02, (n, 3)), axis=0)), index=dates, columns=["A", "B", "C"])
+    volume = pd.DataFrame(rng.lognormal(10, 0.7, (n, 3)), index=dates, columns=close.columns)
+    close.iloc[:40, 2] = np.nan  # a late listing
+    close.iloc[[90, 150, 151], 0] = np.nan  # a halt and a missing bar on days the others traded
+    volume[close.isna()] = np.nan  # as build_panel leaves them
+    return close, volume
+
+def _row_inputs(close: pd.Series, volume: pd.Series) -> pd.DataFrame:
+    """The columns generate_score reads, computed the way a single-ticker frame would have them."""
+    delta = close.diff()
+    gain = delta.clip(lower=0).ewm(alpha=1/14, adjust=False).mean()
+    loss = -delta.clip(upper=0).ewm(alpha=1/14, adjust=False).mean()
+    return pd.DataFrame({
+        "Close": close,
+        "EMA20": close.ewm(span=20, adjust=False).mean(),
+        "EMA50": close.ewm(span=50, adjust=False).mean(),
+        "RSI": 100 - (100 / (1 + gain / loss)),
+        "BB_lower": close.rolling(window=20).mean() - 2 * close.rolling(window=20).std(),
+        "Volume_Spike": volume / volume.rolling(window=20).mean(),
+    })
+
+def test_generate_scores_matches_generate_score():
+    close, volume = _panel()
+    vectorized = scoring.generate_scores(close, volume)
+    for ticker in close.columns:
+        # each symbol scored on its own bars only, as a single-ticker backtest would
+        own = close[ticker].notna()
+        inputs = _row_inputs(close.loc[own, ticker], volume.loc[own, ticker])
+        expected = inputs.apply(scoring.generate_score, axis=1).astype(float).reindex(close.index, fill_value=0.0)
+        pd.testing.assert_series_equal(vectorized[ticker], expected, check_names=False)
+
+def test_gaps_in_other_symbols_do_not_change_a_score():
+    close, volume = _panel()
+    alone = scoring.generate_scores(close[["B"]], volume[["B"]])["B"]
+    # B on the union calendar with A's and C's gaps, and a day only A traded
+    extra_day = close.index[-1] + pd.offsets.BDay()
+    close.loc[extra_day] = [101.0, np.nan, np.nan]
+    volume.loc[extra_day] = [5000.0, np.nan, np.nan]
+    together = scoring.generate_scores(close, volume)["B"]
+    pd.testing.assert_series_equal(together.iloc[:-1], alone, check_names=False, check_freq=False)
+    assert together.iloc[-1] == 0.0
@@ -0,0 +1,140 @@
+import asyncio
+import time
+
+import pytest
+import requests
+
+import upstream
+
+def _batcher(calls, fetch_seconds=0.2):
+    def fetch_quotes(symbols):
+        calls.append(list(symbols))
+        time.sleep(fetch_seconds)
+        return [{"symbol": s, "regularMarketPrice": 1.0} for s in symbols]
+    return upstream.QuoteBatcher(fetch_quotes, upstream.TokenBucket(rate=100, capacity=100), window=0.03)
+
+def test_concurrent_quotes_share_one_upstream_call():
+    calls = []
+
+    async def scenario():
+        batcher = _batcher(calls)
+        return await asyncio.gather(batcher.get_quote("A"), batcher.get_quote("B"), batcher.get_quotes(["A", "C"]))
+
+    a, b, ac = asyncio.run(scenario())
+    assert calls == [["A", "B", "C"]]
+    assert a["symbol"] == "A" and b["symbol"] == "B" and set(ac) == {"A", "C"}
+
+def test_quote_queued_during_inflight_fetch_is_flushed():
+    calls = []
+
+    async def scenario():
+        batcher = _batcher(calls)
+        first = asyncio.ensure_future(batcher.get_quote("A"))
+        await asyncio.sleep(0.1)  # the first flush is now waiting on the upstream call
+        second = await asyncio.wait_for(batcher.get_quote("B"), timeout=2)
+        return await first, second, batcher.pending
+
+    a, b, pending = asyncio.run(scenario())
+    assert a["symbol"] == "A" and b["symbol"] == "B"
+    assert calls == [["A"], ["B"]]
+    assert pending == {}
+
+def test_bulk_acquires_leave_headroom_for_interactive_calls():
+    async def scenario():
+        bucket = upstream.TokenBucket(rate=5, capacity=10)
+        bulk = [asyncio.ensure_future(bucket.acquire(120, reserve=5)) for _ in range(200)]
+        await asyncio.sleep(0.05)
+        lowest = bucket.tokens
+        await bucket.acquire(0.0)  # would be shed if bulk work had booked the quota ahead
+        done = sum(task.done() for task in bulk)
+        for task in bulk:
+            task.cancel()
+        await asyncio.gather(*bulk, return_exceptions=True)
+        return lowest, done
+
+    lowest, done = asyncio.run(scenario())
+    assert lowest >= 5
+    assert done == 5
+
+def test_cancelled_wait_returns_its_token():
+    async def scenario():
+        bucket = upstream.TokenBucket(rate=1, capacity=1)
+        await bucket.acquire(0.0)
+        waiter = asyncio.ensure_future(bucket.acquire(5.0))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        bucket._refill()
+        return bucket.tokens
+
+    assert asyncio.run(scenario()) > 0
+
+def test_acquire_sheds_when_the_wait_exceeds_max_wait():
+    async def scenario():
+        bucket = upstream.TokenBucket(rate=1, capacity=2)
+        await bucket.acquire(0.0)
+        await bucket.acquire(0.0)
+        with pytest.raises(upstream.QuotaExhaustedError):
+            await bucket.acquire(0.5)
+        start = time.monotonic()
+        await bucket.acquire(1.5)  # within max_wait: waits for the next token instead
+        return time.monotonic() - start
+
+    assert 0.8 < asyncio.run(scenario()) < 1.5
+
+def _http_error(status: int) -> requests.HTTPError:
+    response = requests.Response()
+    response.status_code = status
+    return requests.HTTPError(f"{status} error", response=response)
+
+class _Flaky:
+    """Raises the given errors in turn, then returns "ok"."""
+
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+def _call(fn, bucket=None, retries=3):
+    bucket = bucket or upstream.TokenBucket(rate=1000, capacity=1000)
+    return asyncio.run(upstream.call_with_retries(fn, limiter=bucket, retries=retries, base_delay=0.001))
+
+@pytest.mark.parametrize("error", [
+    _http_error(500), _http_error(503), _http_error(429),
+    requests.exceptions.ConnectionError("reset"), requests.exceptions.Timeout("slow"),
+])
+def test_transient_failures_are_retried(error):
+    fn = _Flaky(error, error)
+    assert _call(fn) == "ok"
+    assert fn.calls == 3
+
+@pytest.mark.parametrize("status", [400, 401, 404])
+def test_client_errors_are_not_retried(status):
+    fn = _Flaky(_http_error(status))
+    with pytest.raises(requests.HTTPError):
+        _call(fn)
+    assert fn.calls == 1
+
+def test_retries_give_up_after_the_limit():
+    fn = _Flaky(*[_http_error(502)] * 5)
+    with pytest.raises(requests.HTTPError):
+        _call(fn, retries=2)
+    assert fn.calls == 3
+
+def test_throttling_drains_the_bucket():
+    bucket = upstream.TokenBucket(rate=1000, capacity=50)
+    drained = []
+    original_drain = bucket.drain
+    bucket.drain = lambda: (drained.append(True), original_drain())
+    fn = _Flaky(_http_error(429))
+    assert _call(fn, bucket) == "ok"
+    assert drained == [True]
+
+    fn = _Flaky(_http_error(500))
+    assert _call(fn, bucket) == "ok"
+    assert drained == [True]
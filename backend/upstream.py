@@ -0,0 +1,157 @@
+# backend/upstream.py
+import asyncio
+import random
+import time
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+class QuotaExhaustedError(Exception):
+    """Raised when a call would have to wait longer than allowed for an upstream token."""
+
+# --- Rate Limiting ---
+class TokenBucket:
+    """
+    Token bucket shared by every upstream call in this process.
+    Waiting callers reserve a token up front (tokens may go negative), so no lock is needed on the event loop.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, max_wait: float, reserve: float = 0.0):
+        """
+        Takes one token, waiting at most `max_wait` seconds. A positive `reserve` marks
+        background work: it only takes tokens while more than `reserve` remain and never
+        books ahead, so interactive callers always find headroom.
+        """
+        if reserve > 0:
+            return await self._acquire_above(reserve, max_wait)
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return
+        wait = (1 - self.tokens) / self.rate
+        if wait > max_wait:
+            metrics.UPSTREAM_SHED.inc()
+            raise QuotaExhaustedError(f"Upstream quota exhausted, next slot in {wait:.2f}s")
+        self.tokens -= 1
+        try:
+            await asyncio.sleep(wait)
+        except asyncio.CancelledError:
+            # The caller went away; give the reserved slot back
+            self.tokens += 1
+            raise
+
+    async def _acquire_above(self, reserve: float, max_wait: float):
+        reserve = min(reserve, self.capacity - 1)
+        deadline = time.monotonic() + max_wait
+        while True:
+            self._refill()
+            if self.tokens >= 1 + reserve:
+                self.tokens -= 1
+                return
+            wait = (1 + reserve - self.tokens) / self.rate
+            if time.monotonic() + wait > deadline:
+                metrics.UPSTREAM_SHED.inc()
+                raise QuotaExhaustedError(f"Upstream quota exhausted for background work, next slot in {wait:.2f}s")
+            await asyncio.sleep(wait)
+
+    def drain(self):
+        """Called when the upstream answers 429: assume the quota is spent for now."""
+        self._refill()
+        self.tokens = min(self.tokens, 0.0)
+
+def _is_retryable(exc: Exception) -> bool:
+    if isinstance(exc, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        return True
+    response = getattr(exc, "response", None)
+    return response is not None and (response.status_code == 429 or response.status_code >= 500)
+
+async def call_with_retries(fn: Callable[..., Any], *args, limiter: TokenBucket, retries: int = 3,
+                            base_delay: float = 0.25, max_wait: float = 2.0, reserve: float = 0.0) -> Any:
+    """Runs a blocking upstream call off the event loop, with rate limiting and exponential backoff + full jitter."""
+    for attempt in range(retries + 1):
+        await limiter.acquire(max_wait, reserve=reserve)
+        try:
+            return await asyncio.to_thread(fn, *args)
+        except requests.exceptions.RequestException as e:
+            if attempt == retries or not _is_retryable(e):
+                raise
+            if getattr(e, "response", None) is not None and e.response.status_code == 429:
+                limiter.drain()
+            delay = random.uniform(0, base_delay * (2 ** attempt))
+            metrics.UPSTREAM_RETRIES.inc()
+            logger.warning(f"Upstream call failed ({e}), retry {attempt + 1}/{retries} in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+# --- Quote Micro-Batching ---
+class QuoteBatcher:
+    """
+    Collects quote requests from concurrent handlers for a short window and merges them
+    into as few multi-symbol upstream calls as possible, then splits the results back to each caller.
+    """
+
+    def __init__(self, fetch_quotes: Callable[[List[str]], List[Dict[str, Any]]], limiter: TokenBucket,
+                 window: float = 0.03, max_symbols: int = 10, max_wait: float = 2.0):
+        self.fetch_quotes = fetch_quotes
+        self.limiter = limiter
+        self.window = window
+        self.max_symbols = max_symbols
+        self.max_wait = max_wait
+        self.pending: Dict[str, List[asyncio.Future]] = {}
+        self.flush_task: Optional[asyncio.Task] = None
+
+    async def get_quotes(self, symbols: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        loop = asyncio.get_running_loop()
+        futures = {}
+        for symbol in dict.fromkeys(symbols):
+            future = loop.create_future()
+            self.pending.setdefault(symbol, []).append(future)
+            futures[symbol] = future
+        if self.flush_task is None or self.flush_task.done():
+            self.flush_task = loop.create_task(self._flush_after_window())
+        results = await asyncio.gather(*futures.values())
+        return dict(zip(futures.keys(), results))
+
+    async def get_quote(self, symbol: str) -> Optional[Dict[str, Any]]:
+        return (await self.get_quotes([symbol]))[symbol]
+
+    async def _flush_after_window(self):
+        await asyncio.sleep(self.window)
+        # Hand the queue over and let the next caller schedule a fresh flush, so symbols
+        # queued while these chunks are still fetching are not left waiting on this task
+        pending, self.pending = self.pending, {}
+        self.flush_task = None
+        symbols = list(pending)
+        chunks = [symbols[i:i + self.max_symbols] for i in range(0, len(symbols), self.max_symbols)]
+        await asyncio.gather(*(self._fetch_chunk(chunk, pending) for chunk in chunks))
+
+    async def _fetch_chunk(self, chunk: List[str], pending: Dict[str, List[asyncio.Future]]):
+        metrics.QUOTE_BATCH_SIZE.observe(len(chunk))
+        try:
+            items = await call_with_retries(self.fetch_quotes, chunk, limiter=self.limiter, max_wait=self.max_wait)
+        except Exception as e:
+            for symbol in chunk:
+                for future in pending[symbol]:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+        by_symbol = {str(item.get("symbol", "")).upper(): item for item in items or []}
+        for symbol in chunk:
+            for future in pending[symbol]:
+                if not future.done():
+                    future.set_result(by_symbol.get(symbol.upper()))
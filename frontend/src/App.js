@@ -1212,7 +1212,9 @@ const AppContextProvider = ({ children }) => {
         
         const indicatorsToFetch = indicators || [ { name: "EMA", params: { period: 50 } } ];
         try {
-            const result = await apiCall(`/analyze`, 'POST', { ticker, period, indicators: indicatorsToFetch });
+            // A chart can't show more bars than it has pixels; let the server downsample long ranges
+            const maxPoints = Math.max(300, Math.ceil(window.innerWidth));
+            const result = await apiCall(`/analyze`, 'POST', { ticker, period, indicators: indicatorsToFetch, max_points: maxPoints });
             
             try {
                 const predictionResult = await apiCall(`/predict?ticker=${ticker}`);